@@ -1,10 +1,38 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, g, jsonify, redirect, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from scraper import get_permanent_free_games, get_temporary_free_games, get_discounted_games
+from cache import SnapshotCache
+from catalog import CatalogGame
+from changes import ChangeLog, boot_version
+from pipeline import (
+    collect_free_games, assemble, fallback_needed, SOURCES, FALLBACK_SOURCES, INTERVALS, DEADLINE
+)
+from health import registry as source_health
+import metrics
+import endpoints
+from query import QueryError, int_arg
+from regions import RegionalSnapshots, region_from_args
+from responses import BodyCache
+from scheduler import RefreshScheduler
+from search import IndexCache
+import shared
+from snapshots import get_store
+import thumbnails
 
 import os
+import threading
+import time
+
+class JSONProvider(DefaultJSONProvider):
+    @staticmethod
+    def default(o):
+        if isinstance(o, CatalogGame):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+
 
 app = Flask(__name__)
+app.json = JSONProvider(app)
 
 # Configure CORS properly
 CORS(app, resources={
@@ -18,23 +46,234 @@ CORS(app, resources={
     }
 })
 
+# With background refresh on (the default) requests only read the snapshot
+# the scheduler publishes; otherwise they go through the TTL cache.
+BACKGROUND_REFRESH = os.environ.get("BACKGROUND_REFRESH", "1") != "0"
+
+# Diff of every published snapshot against the previous one
+changes = ChangeLog()
+
+def start_scheduler(version=0, on_publish=changes.record):
+    """Refresh every source in a background thread of this process."""
+    global scheduler
+    # Numbered after this boot's start, see boot_version
+    version = max(version, boot_version())
+    store = get_store()
+    # Pick up results other workers saved while this one was following
+    store.reload()
+    scheduler = RefreshScheduler(
+        dict(SOURCES, **FALLBACK_SOURCES), INTERVALS, assemble,
+        needed=fallback_needed, deadline=DEADLINE,
+        restored=store.last_good_all(), record=store.save_results,
+        on_publish=on_publish, version=version
+    )
+    scheduler.start()
+    return scheduler.get
+
+def leader_report():
+    """What followers serve at /api/health/sources and /metrics for the
+    sources only the leader fetches."""
+    return {"health": source_health.snapshot(), "metrics": metrics.render(metrics.SOURCE_METRICS)}
+
+def load_shared(payload, meta):
+    changes.record(payload, meta)
+    # /img may be asked for thumbnails another worker rewrote
+    if thumbnails.ENABLED:
+        thumbnails.proxy.register(payload)
+
+scheduler = None
+if shared.ENABLED:
+    # Several workers: the one holding the lock refreshes, the others read
+    # its snapshot from a shared file
+    shared_snapshot = shared.SharedSnapshot(
+        shared.PATH, start_scheduler, on_load=load_shared, report=leader_report
+    )
+    shared_snapshot.start()
+    current_snapshot = shared_snapshot.get
+elif BACKGROUND_REFRESH:
+    current_snapshot = start_scheduler()
+else:
+    cache = SnapshotCache(collect_free_games, on_publish=changes.record, version=boot_version())
+    current_snapshot = cache.get
+
+# Other regions overlay their own Epic/Steam results on the snapshot above
+regional = RegionalSnapshots(current_snapshot)
+
+def snapshot_for(sections=None):
+    """The snapshot for the ``country``/``locale`` of the query string."""
+    region = region_from_args(request.args)
+    if region is None:
+        return current_snapshot(sections)
+    return regional.get(region, sections)
+
+# Serialized + compressed /api/free-games bodies of the current snapshots
+bodies = BodyCache()
+
+# Search indexes of the current snapshots, rebuilt when the version changes
+indexes = IndexCache()
+
+# Public address of this API for thumbnail URLs, when the request's own
+# host isn't it (e.g. behind a reverse proxy). Set it in production: without
+# it the address comes from the request's Host header.
+IMAGE_BASE_URL = os.environ.get("IMAGE_BASE_URL", "")
+
+def image_base():
+    return IMAGE_BASE_URL or request.url_root
+
+def with_thumbnails(data):
+    """Point every thumbnail in ``data`` at /img when the proxy is on."""
+    if not thumbnails.ENABLED:
+        return data
+    return thumbnails.proxy.rewrite_payload(data, image_base())
+
+@app.before_request
+def start_request():
+    g.started = time.perf_counter()
+    # Opt-in spans, returned in the Server-Timing header and kept for
+    # /api/traces
+    g.trace = None
+    if metrics.TRACE_ALL or request.headers.get("X-Trace"):
+        g.trace = metrics.Trace(f"{request.method} {request.path}")
+        metrics.current_trace.set(g.trace)
+
+@app.after_request
+def finish_request(response):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.HTTP_SECONDS.observe(time.perf_counter() - g.started, route=route)
+    metrics.HTTP_REQUESTS.inc(route=route, status=response.status_code)
+    if g.trace is not None:
+        metrics.current_trace.set(None)
+        g.trace.finish()
+        response.headers["Server-Timing"] = g.trace.server_timing()
+    return response
+
+def source_health_snapshot():
+    """Health of every source: the leader's when this worker follows a
+    shared snapshot, plus the regional fetches of this worker."""
+    report = shared_snapshot.leader_report() if shared.ENABLED else None
+    if report is None:
+        return source_health.snapshot()
+    return dict(report["health"], **source_health.snapshot())
+
+@app.route("/metrics")
+def get_metrics():
+    states = {"closed": 0, "half_open": 1, "open": 2}
+    for name, entry in source_health_snapshot().items():
+        metrics.BREAKER_STATE.set(states[entry["state"]], source=name)
+    report = shared_snapshot.leader_report() if shared.ENABLED else None
+    if report is None:
+        body = metrics.render()
+    else:
+        # The scraper metrics are the leader's; this worker only has its
+        # regional fetches in them
+        own = [metric for metric in metrics.REGISTRY if metric not in metrics.SOURCE_METRICS]
+        body = report["metrics"] + metrics.render(own)
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/traces")
+def get_traces():
+    return jsonify([trace.to_dict() for trace in reversed(metrics.recent_traces)])
+
 @app.route("/")
 def index():
     return "Free Game Scraper API is running!"
 
 @app.route("/api/free-games")
 def get_free_games():
-    response = jsonify({
-        "permanent": {
-            "pc": get_permanent_free_games().get("pc", {})
-        },
-        "temporary": get_temporary_free_games(),
-        
-        "sale": get_discounted_games()
-    })
+    payload, meta = snapshot_for()
+    # The body has the thumbnail base URL baked in, so one client's Host
+    # header must not pick it for everyone
+    key = (meta.get("region", {}).get("country"), meta.get("region", {}).get("locale"), meta["version"],
+           image_base() if thumbnails.ENABLED else None)
+    response = bodies.get(key, lambda: dict(with_thumbnails(payload), meta=meta)).response(request)
     response.headers.add('Access-Control-Allow-Origin', 'https://vimanga-x64.github.io')
     return response
 
+@app.route("/api/cache/stats")
+def get_cache_stats():
+    if shared.ENABLED:
+        return jsonify(dict(shared_snapshot.stats(), mode="shared"))
+    if BACKGROUND_REFRESH:
+        return jsonify({"mode": "background", "version": scheduler.version})
+    return jsonify(dict(cache.stats_snapshot(), mode="on-demand"))
+
+@app.route("/api/health/sources")
+def get_source_health():
+    return jsonify(source_health_snapshot())
+
+@app.route("/api/changes")
+def get_changes():
+    since = int_arg(request.args, "since", 0, minimum=0)
+    return jsonify(changes.since(since))
+
+# Each open stream holds one of the worker's threads for as long as the
+# client stays connected, so only this many may be open per worker
+CHANGE_STREAMS_MAX = int(os.environ.get("CHANGE_STREAMS_MAX", 4))
+change_streams = threading.BoundedSemaphore(CHANGE_STREAMS_MAX)
+
+@app.route("/api/changes/stream")
+def stream_changes():
+    if not change_streams.acquire(blocking=False):
+        response = jsonify({"error": "Too many open change streams, poll /api/changes instead"})
+        response.status_code = 503
+        response.headers["Retry-After"] = "30"
+        return response
+    # EventSource sends the id of the last event it saw when it reconnects
+    since = request.headers.get("Last-Event-ID") or request.args.get("since")
+    since = int(since) if since and since.isdigit() else changes.version
+    response = Response(changes.stream(since), mimetype="text/event-stream")
+    response.call_on_close(change_streams.release)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@app.errorhandler(QueryError)
+def bad_query(e):
+    return jsonify({"error": str(e)}), 400
+
+@app.route("/api/free-games/temporary/<store>")
+def get_temporary_store(store):
+    payload, _ = snapshot_for(["temporary"])
+    data, status = endpoints.temporary_store(payload, store, request.args)
+    return jsonify(with_thumbnails(data)), status
+
+@app.route("/api/permanent")
+def get_permanent():
+    payload, _ = snapshot_for(["permanent"])
+    data, status = endpoints.permanent(payload, request.args)
+    return jsonify(with_thumbnails(data)), status
+
+@app.route("/api/sale")
+def get_sale():
+    payload, _ = snapshot_for(["sale"])
+    data, status = endpoints.sale(payload, request.args)
+    return jsonify(with_thumbnails(data)), status
+
+@app.route("/api/search")
+def search_games():
+    payload, meta = snapshot_for()
+    key = (meta.get("region", {}).get("country"), meta.get("region", {}).get("locale"), meta["version"])
+    return jsonify(with_thumbnails(indexes.get(key, payload).search(request.args)))
+
+@app.route("/img/<key>")
+def get_thumbnail(key):
+    if not thumbnails.ENABLED:
+        return jsonify({"error": "Thumbnail proxy is disabled"}), 404
+    width = thumbnails.pick_width(int_arg(request.args, "w", thumbnails.DEFAULT_WIDTH, minimum=1))
+    fmt = "webp" if "image/webp" in request.headers.get("Accept", "") else "jpeg"
+    try:
+        data = thumbnails.proxy.variant(key, width, fmt)
+    except KeyError:
+        return jsonify({"error": "Unknown image"}), 404
+    except Exception as e:
+        # Let the browser load the original rather than show nothing
+        print(f"Thumbnail proxy error for {key}:", e)
+        return redirect(thumbnails.proxy.urls[key])
+    response = Response(data, mimetype=thumbnails.FORMATS[fmt])
+    response.headers["Cache-Control"] = "public, max-age=604800"
+    response.headers["Vary"] = "Accept"
+    return response
+
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
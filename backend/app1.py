@@ -1,33 +1,49 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 import json
-import requests
+import re
+import fetch
 import os
-from bs4 import BeautifulSoup
+from dedup import merge_games
+from parsing import make_soup, selector, strainer
+from snapshots import get_store
 from pathlib import Path
 
 app = Flask(__name__)
 CORS(app)  # Allow frontend access
 DB_PATH = Path("database.json")
 
+EPIC_LINKS = strainer("a", href=re.compile(r"^/en-US/p/"))
+EPIC_LINK = selector("a[href^='/en-US/p/']")
+STEAM_TAB_ITEMS = strainer("a", class_="tab_item")
+STEAM_TAB_NAME = selector("div.tab_item_name")
+
 def scrape_epic_games():
     url = "https://store.epicgames.com/en-US/free-games"
     headers = {"User-Agent": "Mozilla/5.0"}
-    soup = BeautifulSoup(requests.get(url, headers=headers).text, "html.parser")
+    return parse_epic_store_page(fetch.get(url, headers=headers).text)
+
+def parse_epic_store_page(html):
+    soup = make_soup(html, EPIC_LINKS)
     games = []
-    for a in soup.select("a[href^='/en-US/p/']"):
+    seen = set()
+    for a in EPIC_LINK.select(soup):
         title = a.get_text(strip=True)
         link = "https://store.epicgames.com" + a["href"]
-        if title and link not in [g["link"] for g in games]:
+        if title and link not in seen:
+            seen.add(link)
             games.append({"title": title, "link": link})
     return games
 
 def scrape_steam():
     url = "https://store.steampowered.com/genre/Free%20to%20Play/"
     headers = {"User-Agent": "Mozilla/5.0"}
-    soup = BeautifulSoup(requests.get(url, headers=headers).text, "html.parser")
+    return parse_steam_genre_page(fetch.get(url, headers=headers).text)
+
+def parse_steam_genre_page(html):
+    soup = make_soup(html, STEAM_TAB_ITEMS)
     games = []
-    for div in soup.select("div.tab_item_name"):
+    for div in STEAM_TAB_NAME.select(soup):
         title = div.get_text(strip=True)
         link = div.find_parent("a")["href"]
         if title:
@@ -37,8 +53,8 @@ def scrape_steam():
 def scrape_all_games():
     return {
         "pc": {
-            "epic_games": scrape_epic_games(),
-            "steam": scrape_steam()
+            "epic_games": merge_games(scrape_epic_games()),
+            "steam": merge_games(scrape_steam())
         },
         "console": {
             "playstation": [],
@@ -47,14 +63,17 @@ def scrape_all_games():
     }
 
 def load_games():
+    data = get_store().last_good("app1")
+    if data is not None:
+        return data
+    # Data saved before the snapshot store existed
     if not DB_PATH.exists():
         return {"pc": {}, "console": {}}
     with open(DB_PATH, "r", encoding="utf-8") as f:
         return json.load(f)
 
 def save_games(data):
-    with open(DB_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+    get_store().save("app1", data)
 
 @app.route("/api/free-games", methods=["GET"])
 def get_free_games():
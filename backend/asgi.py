@@ -0,0 +1,316 @@
+"""ASGI entry point: the API of app.py served from one event loop.
+
+    python asgi.py                  # or: uvicorn asgi:app --port 5000
+
+Every store is fetched with an async HTTP client (httpx), so all upstream
+requests of a refresh overlap without a thread each, and slow clients
+don't tie up worker threads either. Responses have the same shape as
+app.py's.
+"""
+import asyncio
+import os
+import re
+import time
+from functools import partial
+from urllib.parse import parse_qs
+
+from werkzeug.http import parse_accept_header, parse_date, parse_etags
+
+import endpoints
+import fetch
+import metrics
+import thumbnails
+from cache import SnapshotCache
+from fanout import AsyncFanOut
+from health import registry as source_health
+from pipeline import (
+    assemble, collect_free_games_async, fallback_needed, FALLBACK_SOURCES, INTERVALS, DEADLINE, SOURCES
+)
+from query import QueryError, int_arg
+from regions import RegionalSnapshots, region_from_args
+from responses import BodyCache, dumps
+from scheduler import RefreshScheduler
+from search import IndexCache
+from snapshots import get_store
+from sources import get_source
+
+# Same switch as app.py: refresh in a background task, or scrape on demand
+# through a TTL cache
+BACKGROUND_REFRESH = os.environ.get("BACKGROUND_REFRESH", "1") != "0"
+IMAGE_BASE_URL = os.environ.get("IMAGE_BASE_URL", "")
+CORS_ORIGINS = re.compile(r"^(https://vimanga-x64\.github\.io|http://localhost(:\d+)?)$")
+
+
+class AsyncSnapshotCache(SnapshotCache):
+    """``SnapshotCache`` for the event loop.
+
+    ``loader(sections)`` is a coroutine function and ``get`` is awaited.
+    Expired sections are served stale while a task refreshes them, missing
+    ones are awaited, and concurrent requests share one refresh per
+    section. ``inflight`` holds those tasks and is only touched on the
+    loop; the entries keep the base class's lock, since ``snapshot`` is
+    also read from worker threads (regional snapshots).
+    """
+
+    async def get(self, sections=None):
+        sections = sections or list(self.ttls)
+        now = time.time()
+        self._expire(now)
+        missing, stale = self._classify(sections, now)
+        for batch in (stale, missing):
+            claimed = [s for s in batch if s not in self.inflight]
+            if claimed:
+                task = asyncio.create_task(self._refresh(claimed))
+                for section in claimed:
+                    self.inflight[section] = task
+        waiting = {self.inflight[s] for s in missing if s in self.inflight}
+        if waiting:
+            # asyncio.wait, unlike gather, leaves the refresh running if
+            # this request is cancelled
+            await asyncio.wait(waiting)
+        return self.snapshot(sections)
+
+    async def _refresh(self, sections):
+        try:
+            self._apply(sections, *await self.loader(sections))
+        except Exception as e:
+            self._failed(sections, e)
+        finally:
+            for section in sections:
+                self.inflight.pop(section, None)
+
+
+async def refresh_forever(scheduler):
+    """Drive a ``RefreshScheduler`` whose fetchers are coroutine functions."""
+    while True:
+        try:
+            scheduler.prune_expired()
+            due = scheduler.due()
+            if due:
+                fanout = AsyncFanOut(scheduler.deadline)
+                for name in due:
+                    fanout.submit(name, scheduler.sources[name])
+                results, meta = await fanout.gather()
+                # Assembling the payload is CPU work, keep it off the loop
+                await asyncio.to_thread(scheduler.apply, due, results, meta)
+        except Exception as e:
+            print("Refresh scheduler error:", e)
+        await asyncio.sleep(scheduler.idle_time())
+
+
+class Request:
+    def __init__(self, scope):
+        self.scope = scope
+        self.path = scope["path"]
+        self.headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+        self.args = {name: values[0] for name, values in query.items()}
+
+    @property
+    def url_root(self):
+        host = self.headers.get("host") or "{}:{}".format(*self.scope["server"])
+        return f"{self.scope.get('scheme', 'http')}://{host}/"
+
+
+def json_response(data, status=200):
+    return status, {"Content-Type": "application/json"}, dumps(data)
+
+
+class Server:
+    """The ASGI application; state is set up in the lifespan startup."""
+
+    def __init__(self):
+        self.client = None
+        self.scheduler = None
+        self.cache = None
+        self.task = None
+        self.regional = None
+        self.bodies = BodyCache()
+        self.indexes = IndexCache()
+        self.routes = [
+            (re.compile(r"^/$"), "/", self.index),
+            (re.compile(r"^/api/free-games$"), "/api/free-games", self.free_games),
+            (re.compile(r"^/api/free-games/temporary/(?P<store>[^/]+)$"), "/api/free-games/temporary/<store>",
+             self.temporary_store),
+            (re.compile(r"^/api/permanent$"), "/api/permanent", self.permanent),
+            (re.compile(r"^/api/sale$"), "/api/sale", self.sale),
+            (re.compile(r"^/api/search$"), "/api/search", self.search),
+            (re.compile(r"^/api/cache/stats$"), "/api/cache/stats", self.cache_stats),
+            (re.compile(r"^/api/health/sources$"), "/api/health/sources", self.source_health),
+            (re.compile(r"^/metrics$"), "/metrics", self.metrics),
+            (re.compile(r"^/img/(?P<key>[^/]+)$"), "/img/<key>", self.thumbnail)
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.handle(scope, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self.startup()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def startup(self):
+        self.client = fetch.async_client()
+        if BACKGROUND_REFRESH:
+            store = get_store()
+            self.scheduler = RefreshScheduler(
+                {name: partial(get_source(name).aload, self.client) for name in dict(SOURCES, **FALLBACK_SOURCES)},
+                INTERVALS, assemble, needed=fallback_needed, deadline=DEADLINE,
+                restored=store.last_good_all(), record=store.save_results
+            )
+            self.task = asyncio.create_task(refresh_forever(self.scheduler))
+            base = self.scheduler.get
+        else:
+            self.cache = AsyncSnapshotCache(partial(collect_free_games_async, self.client))
+            base = self.cache.snapshot
+        # Regions still fetch with the threaded fetchers, off the loop
+        self.regional = RegionalSnapshots(base)
+
+    async def shutdown(self):
+        if self.task:
+            self.task.cancel()
+        await self.client.aclose()
+
+    async def snapshot_for(self, request, sections=None):
+        region = region_from_args(request.args)
+        if self.cache is not None:
+            snapshot = await self.cache.get(sections)
+        else:
+            snapshot = self.scheduler.get()
+        if region is None:
+            return snapshot
+        return await asyncio.to_thread(self.regional.get, region, sections)
+
+    def image_base(self, request):
+        return IMAGE_BASE_URL or request.url_root
+
+    def with_thumbnails(self, data, request):
+        if not thumbnails.ENABLED:
+            return data
+        return thumbnails.proxy.rewrite_payload(data, self.image_base(request))
+
+    async def handle(self, scope, send):
+        started = time.perf_counter()
+        request = Request(scope)
+        route, status, headers, body = "unmatched", 404, {"Content-Type": "application/json"}, b'{"error":"Not found"}'
+        if scope["method"] == "OPTIONS":
+            route, status, headers, body = request.path, 204, {}, b""
+        else:
+            for pattern, name, handler in self.routes:
+                match = pattern.match(request.path)
+                if match:
+                    route = name
+                    try:
+                        status, headers, body = await handler(request, **match.groupdict())
+                    except QueryError as e:
+                        status, headers, body = json_response({"error": str(e)}, 400)
+                    except Exception as e:
+                        print(f"Error serving {request.path}: {e}")
+                        status, headers, body = json_response({"error": "Internal server error"}, 500)
+                    break
+
+        origin = request.headers.get("origin", "")
+        if request.path.startswith("/api/") and CORS_ORIGINS.match(origin):
+            headers["Access-Control-Allow-Origin"] = origin
+            headers["Vary"] = ", ".join(filter(None, [headers.get("Vary"), "Origin"]))
+            if scope["method"] == "OPTIONS":
+                headers["Access-Control-Allow-Methods"] = "GET, OPTIONS"
+                headers["Access-Control-Allow-Headers"] = "Content-Type"
+        headers["Content-Length"] = str(len(body))
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
+        })
+        await send({"type": "http.response.body", "body": body if scope["method"] != "HEAD" else b""})
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - started, route=route)
+        metrics.HTTP_REQUESTS.inc(route=route, status=status)
+
+    async def index(self, request):
+        return 200, {"Content-Type": "text/plain; charset=utf-8"}, b"Free Game Scraper API is running!"
+
+    async def free_games(self, request):
+        payload, meta = await self.snapshot_for(request)
+        # The thumbnail base URL is part of the body (see app.py)
+        key = (meta.get("region", {}).get("country"), meta.get("region", {}).get("locale"), meta["version"],
+               self.image_base(request) if thumbnails.ENABLED else None)
+        # Serializing and compressing happens once per version, off the loop
+        encoded = await asyncio.to_thread(
+            self.bodies.get, key, lambda: dict(self.with_thumbnails(payload, request), meta=meta)
+        )
+        status, body, headers = encoded.negotiate(
+            parse_etags(request.headers.get("if-none-match")),
+            parse_accept_header(request.headers.get("accept-encoding")),
+            parse_date(request.headers.get("if-modified-since"))
+        )
+        return status, dict(headers, **{"Content-Type": "application/json"}), body
+
+    async def temporary_store(self, request, store):
+        payload, _ = await self.snapshot_for(request, ["temporary"])
+        data, status = endpoints.temporary_store(payload, store, request.args)
+        return json_response(self.with_thumbnails(data, request), status)
+
+    async def permanent(self, request):
+        payload, _ = await self.snapshot_for(request, ["permanent"])
+        data, status = endpoints.permanent(payload, request.args)
+        return json_response(self.with_thumbnails(data, request), status)
+
+    async def sale(self, request):
+        payload, _ = await self.snapshot_for(request, ["sale"])
+        data, status = endpoints.sale(payload, request.args)
+        return json_response(self.with_thumbnails(data, request), status)
+
+    async def search(self, request):
+        payload, meta = await self.snapshot_for(request)
+        key = (meta.get("region", {}).get("country"), meta.get("region", {}).get("locale"), meta["version"])
+        index = await asyncio.to_thread(self.indexes.get, key, payload)
+        return json_response(self.with_thumbnails(index.search(request.args), request))
+
+    async def cache_stats(self, request):
+        if self.cache is None:
+            return json_response({"mode": "background", "version": self.scheduler.version})
+        return json_response(dict(self.cache.stats_snapshot(), mode="on-demand"))
+
+    async def source_health(self, request):
+        return json_response(source_health.snapshot())
+
+    async def metrics(self, request):
+        states = {"closed": 0, "half_open": 1, "open": 2}
+        for name, entry in source_health.snapshot().items():
+            metrics.BREAKER_STATE.set(states[entry["state"]], source=name)
+        return 200, {"Content-Type": "text/plain; version=0.0.4"}, metrics.render().encode("utf-8")
+
+    async def thumbnail(self, request, key):
+        if not thumbnails.ENABLED:
+            return json_response({"error": "Thumbnail proxy is disabled"}, 404)
+        width = thumbnails.pick_width(int_arg(request.args, "w", thumbnails.DEFAULT_WIDTH, minimum=1))
+        fmt = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+        try:
+            data = await asyncio.to_thread(thumbnails.proxy.variant, key, width, fmt)
+        except KeyError:
+            return json_response({"error": "Unknown image"}, 404)
+        except Exception as e:
+            print(f"Thumbnail proxy error for {key}:", e)
+            return 302, {"Location": thumbnails.proxy.urls[key]}, b""
+        return 200, {
+            "Content-Type": thumbnails.FORMATS[fmt],
+            "Cache-Control": "public, max-age=604800",
+            "Vary": "Accept"
+        }, data
+
+
+app = Server()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
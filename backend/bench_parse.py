@@ -0,0 +1,63 @@
+"""Compare HTML parse time and peak memory per store page.
+
+Runs every HTML parser against the saved pages in ``fixtures/`` with each
+BeautifulSoup backend, with and without partial parsing:
+
+    python bench_parse.py [--repeat 20] [--parsers lxml,html.parser]
+"""
+import argparse
+import os
+import statistics
+import time
+import tracemalloc
+
+import parsing
+from scraper import parse_itchio_games, parse_steam_search, parse_gog_games, parse_origin_games
+from app1 import parse_epic_store_page, parse_steam_genre_page
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+PAGES = [
+    ("itch.io free", "itchio_free.html", parse_itchio_games),
+    ("Steam search", "steam_search.html", parse_steam_search),
+    ("GOG games", "gog_games.html", parse_gog_games),
+    ("Origin free", "origin_free_games.html", parse_origin_games),
+    ("Epic store page", "epic_free_games.html", parse_epic_store_page),
+    ("Steam F2P genre", "steam_genre_f2p.html", parse_steam_genre_page)
+]
+
+
+def measure(parser, html, repeat):
+    tracemalloc.start()
+    games = parser(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser(html)
+        timings.append(time.perf_counter() - start)
+    return len(games), statistics.median(timings), peak
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    arg_parser.add_argument("--parsers", default="lxml,html.parser")
+    args = arg_parser.parse_args()
+
+    print(f"{'page':<18}{'backend':<13}{'partial':<9}{'games':>6}{'median ms':>11}{'peak KiB':>10}")
+    for label, filename, parser in PAGES:
+        with open(os.path.join(FIXTURES_DIR, filename), encoding="utf-8") as f:
+            html = f.read()
+        for backend in args.parsers.split(","):
+            for partial in (False, True):
+                parsing.HTML_PARSER = backend
+                parsing.PARTIAL_PARSING = partial
+                count, median, peak = measure(parser, html, args.repeat)
+                print(f"{label:<18}{backend:<13}{str(partial):<9}{count:>6}{median * 1000:>11.2f}{peak / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
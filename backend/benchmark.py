@@ -0,0 +1,163 @@
+"""Offline benchmark of every scraper and the /api/free-games handler.
+
+Replays the recorded responses in ``fixtures/`` through the local stand-in
+server (standin.py), so nothing touches the real stores:
+
+    python benchmark.py --scale 1,10 --runs 20 --save bench.json
+    python benchmark.py --scale 1,10 --compare bench.json --tolerance 0.25
+
+``--compare`` exits with status 1 when any p95 latency or allocation peak is
+worse than the baseline by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from catalog import json_default
+from standin import StandInServer
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = max(0, min(len(values) - 1, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+def count_items(value):
+    if isinstance(value, dict):
+        return sum(count_items(v) for k, v in value.items() if k != "meta")
+    if isinstance(value, list):
+        return len(value)
+    return 0
+
+
+def measure(fn, runs):
+    """Time ``fn`` ``runs`` times and trace the allocations of one extra run."""
+    fn()  # warm up connection pools and caches
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if isinstance(result, bytes):
+        payload = len(result)
+        items = count_items(json.loads(result))
+    else:
+        payload = len(json.dumps(result, default=json_default).encode("utf-8"))
+        items = count_items(result)
+    return {
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+        "p99_ms": percentile(timings, 99) * 1000,
+        "peak_kib": peak / 1024,
+        "payload_kib": payload / 1024,
+        "items": items
+    }
+
+
+def targets():
+    # Imported late so the UPSTREAM_OVERRIDE set in main() is picked up
+    import scraper
+    import app
+
+    client = app.app.test_client()
+
+    def handler():
+        app.cache.invalidate()
+        return client.get("/api/free-games").data
+
+    def cached_handler():
+        return client.get("/api/free-games").data
+
+    return {
+        "get_permanent_free_games": scraper.get_permanent_free_games,
+        "get_cheap_shark_free_games": scraper.get_cheap_shark_free_games,
+        "get_epic_free_games": scraper.get_epic_free_games,
+        "get_humble_free_games": scraper.get_humble_free_games,
+        "get_itchio_free_games": scraper.get_itchio_free_games,
+        "get_origin_free_games": scraper.get_origin_free_games,
+        "get_steam_free_games": scraper.get_steam_free_games,
+        "get_gog_free_games": scraper.get_gog_free_games,
+        "get_steam_discounted_games": scraper.get_steam_discounted_games,
+        "get_gog_discounted_games": scraper.get_gog_discounted_games,
+        "/api/free-games": handler,
+        "/api/free-games (cached)": cached_handler
+    }
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for scale, rows in results.items():
+        for name, row in rows.items():
+            base = baseline.get(scale, {}).get(name)
+            if not base:
+                continue
+            for metric in ("p95_ms", "peak_kib"):
+                if row[metric] > base[metric] * (1 + tolerance):
+                    regressions.append(
+                        f"scale {scale} {name}: {metric} {row[metric]:.1f} vs baseline {base[metric]:.1f}"
+                    )
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--scale", default="1,10", help="comma separated fixture scale factors")
+    arg_parser.add_argument("--runs", type=int, default=20)
+    arg_parser.add_argument("--revalidate", action="store_true",
+                            help="have the stand-in send ETags so repeat fetches are 304s")
+    arg_parser.add_argument("--save", help="write the results to this JSON file")
+    arg_parser.add_argument("--compare", help="baseline JSON written by --save")
+    arg_parser.add_argument("--tolerance", type=float, default=0.25)
+    args = arg_parser.parse_args()
+
+    server = StandInServer(revalidate=args.revalidate).start()
+    os.environ["UPSTREAM_OVERRIDE"] = server.base_url
+    os.environ["HTTP_CACHE_DIR"] = ""
+    os.environ["SNAPSHOT_DB"] = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    os.environ["BACKGROUND_REFRESH"] = "0"
+    functions = targets()
+
+    results = {}
+    for scale in [int(s) for s in args.scale.split(",")]:
+        server.load(scale)
+        print(f"\nscale x{scale}")
+        print(f"{'target':<30}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'peak KiB':>10}{'payload KiB':>13}{'items':>7}")
+        rows = {}
+        for name, fn in functions.items():
+            row = measure(fn, args.runs)
+            rows[name] = row
+            print(f"{name:<30}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+                  f"{row['peak_kib']:>10.0f}{row['payload_kib']:>13.1f}{row['items']:>7}")
+        results[str(scale)] = rows
+
+    server.shutdown()
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print("\nNo regressions against", args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import expiry
+
+# How long each section of the payload is served before it is refreshed, in
+# seconds. The FreeToGame catalog barely changes, giveaways and sales do.
+DEFAULT_TTLS = {
+    "permanent": int(os.environ.get("CACHE_TTL_PERMANENT", 6 * 60 * 60)),
+    "temporary": int(os.environ.get("CACHE_TTL_TEMPORARY", 15 * 60)),
+    "sale": int(os.environ.get("CACHE_TTL_SALE", 30 * 60))
+}
+
+
+class SnapshotCache:
+    """In-process cache of the combined payload, one entry per section.
+
+    ``loader(sections)`` must return ``(payload, meta)`` with one key per
+    requested section. Expired sections are served stale while a background
+    thread refreshes them; sections that were never loaded are fetched in
+    the calling thread (unless it won't wait, see ``get``). Only one
+    refresh per section runs at a time, other
+    requests wait for it (or keep getting the stale copy).
+
+    ``on_publish(payload, meta)`` is called with all loaded sections every
+    time a refresh changes one of them, or offers leave them because they
+    ended.
+
+    A section whose first load fails or comes back empty is normally kept
+    (empty) for its whole TTL; with ``retry`` it is left out instead and
+    loaded again ``retry`` seconds later.
+    """
+
+    def __init__(self, loader, ttls=None, on_publish=None, retry=None, version=0):
+        self.loader = loader
+        self.on_publish = on_publish
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.retry = retry
+        self.entries = {}    # section -> (value, loaded_at)
+        self.failed = {}     # section -> when its first load failed (with retry)
+        self.sources = {}    # section -> source meta of its last refresh
+        self.inflight = {}   # section -> Event set when its refresh ends
+        self.heap = []       # end dates of the loaded offers
+        self.lock = threading.Lock()
+        self.version = version  # bumped whenever any section changes
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+
+    def get(self, sections=None, wait=True):
+        """Return ``(payload, meta)`` with ``sections`` (default: all of them).
+
+        Only the requested sections are loaded or refreshed. With
+        ``wait=False`` missing sections are loaded in the background too and
+        left out of the result until they are there.
+        """
+        sections = sections or list(self.ttls)
+        now = time.time()
+        self._expire(now)
+        missing, stale = self._classify(sections, now)
+
+        if not wait:
+            stale, missing = stale + missing, []
+
+        if stale:
+            claimed, done, _ = self._claim(stale)
+            if claimed:
+                threading.Thread(target=self._refresh, args=(claimed, done), daemon=True).start()
+
+        if missing:
+            claimed, done, others = self._claim(missing)
+            if claimed:
+                self._refresh(claimed, done)
+            for event in others:
+                event.wait()
+
+        return self._snapshot(sections)
+
+    def snapshot(self, sections=None):
+        """``(payload, meta)`` of the loaded ``sections``, without loading."""
+        return self._snapshot(sections or list(self.ttls))
+
+    def invalidate(self, *sections):
+        with self.lock:
+            for section in sections or list(self.entries):
+                self.entries.pop(section, None)
+
+    def _classify(self, sections, now):
+        """``(missing, stale)``: the sections never loaded and the expired
+        ones, counting hits and misses."""
+        missing, stale = [], []
+        with self.lock:
+            for section in sections:
+                entry = self.entries.get(section)
+                if entry is None:
+                    self.stats["misses"] += 1
+                    if now - self.failed.get(section, float("-inf")) >= (self.retry or 0):
+                        missing.append(section)
+                elif now - entry[1] > self.ttls[section]:
+                    stale.append(section)
+                    self.stats["stale_hits"] += 1
+                else:
+                    self.stats["hits"] += 1
+        return missing, stale
+
+    def _claim(self, sections):
+        """Mark the sections nobody is refreshing yet as ours.
+
+        Returns ``(claimed, done, others)``: the sections this caller must
+        refresh, the event to set once it is done, and the events of the
+        refreshes other threads already run for the remaining sections.
+        """
+        with self.lock:
+            claimed = [s for s in sections if s not in self.inflight]
+            others = {self.inflight[s] for s in sections if s in self.inflight}
+            done = threading.Event()
+            for section in claimed:
+                self.inflight[section] = done
+        return claimed, done, others
+
+    def _refresh(self, sections, done):
+        try:
+            self._apply(sections, *self.loader(sections))
+        except Exception as e:
+            self._failed(sections, e)
+        finally:
+            with self.lock:
+                for section in sections:
+                    self.inflight.pop(section, None)
+            done.set()
+
+    def _apply(self, sections, payload, meta):
+        """Take in what the loader returned for ``sections``."""
+        now = time.time()
+        with self.lock:
+            version = self.version
+            for section in sections:
+                value = payload.get(section)
+                # Don't let a failed refresh wipe out data we already have
+                if not has_games(value) and (section in self.entries or self.retry is not None):
+                    self.stats["refresh_errors"] += 1
+                    if section not in self.entries:
+                        self.failed[section] = now
+                    continue
+                self.failed.pop(section, None)
+                self.entries[section] = (value, now)
+                self.sources[section] = meta.get("sources", {})
+                self.version += 1
+            self.heap = expiry.build_heap({s: value for s, (value, _) in self.entries.items()})
+            self._prune(now)
+            self.stats["refreshes"] += 1
+            changed = self.version != version
+        if changed and self.on_publish:
+            self.on_publish(*self._snapshot(list(self.entries)))
+
+    def _failed(self, sections, error):
+        print(f"Cache refresh error for {sections}: {error}")
+        now = time.time()
+        with self.lock:
+            self.stats["refresh_errors"] += 1
+            if self.retry is not None:
+                for section in sections:
+                    if section not in self.entries:
+                        self.failed[section] = now
+
+    def _expire(self, now):
+        """Drop the offers that have ended, publishing if any did."""
+        with self.lock:
+            pruned = self._prune(now)
+        if pruned and self.on_publish:
+            self.on_publish(*self._snapshot(list(self.entries)))
+
+    def _prune(self, now):
+        """Drop the offers that have ended from the loaded sections (with
+        the lock held)."""
+        if (expiry.next_expiry(self.heap) or float("inf")) > now:
+            return False
+        current = {section: value for section, (value, _) in self.entries.items()}
+        for section, value in expiry.prune(current, self.heap, now).items():
+            if value is not current[section]:
+                self.entries[section] = (value, self.entries[section][1])
+        self.version += 1
+        return True
+
+    def stats_snapshot(self):
+        """Hit/miss counters and the age of every section."""
+        now = time.time()
+        with self.lock:
+            sections = {
+                section: {"age_s": round(now - loaded_at), "stale": now - loaded_at > self.ttls[section]}
+                for section, (_, loaded_at) in self.entries.items()
+            }
+            return dict(self.stats, version=self.version, sections=sections)
+
+    def _snapshot(self, sections):
+        # Only things that change with the data go in here, so the same
+        # version always produces the same document (see responses.py)
+        payload, sections_meta, sources = {}, {}, {}
+        with self.lock:
+            for section in sections:
+                entry = self.entries.get(section)
+                if entry is None:
+                    continue
+                value, loaded_at = entry
+                payload[section] = value
+                sections_meta[section] = {
+                    "loaded_at": datetime.utcfromtimestamp(loaded_at).isoformat(),
+                    "ttl_s": self.ttls[section]
+                }
+                for name, source_meta in self.sources.get(section, {}).items():
+                    sources[name] = source_meta
+            meta = {
+                "version": self.version,
+                "cache": {"sections": sections_meta},
+                "sources": sources
+            }
+        return payload, meta
+
+def has_games(value):
+    if isinstance(value, dict):
+        return any(has_games(v) for v in value.values())
+    return bool(value)
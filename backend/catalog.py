@@ -0,0 +1,125 @@
+import codecs
+import json
+import sys
+import threading
+from dataclasses import dataclass
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogGame:
+    """One permanently free game, as served under ``permanent.pc``."""
+    title: str
+    link: str
+    thumbnail: str
+    genre: str
+    store: str
+
+    def to_dict(self):
+        # Much cheaper than dataclasses.asdict, which deep-copies every field
+        return {
+            "title": self.title,
+            "link": self.link,
+            "thumbnail": self.thumbnail,
+            "genre": self.genre,
+            "store": self.store
+        }
+
+
+def json_default(value):
+    """``default=`` hook for json encoders that meet ``CatalogGame`` records."""
+    if isinstance(value, CatalogGame):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def iter_json_array(chunks):
+    """Yield the items of a top-level JSON array from an iterable of bytes.
+
+    Only the current item and the unread rest of the last chunk are held in
+    memory, never the whole document. ``chunks`` is read to the end even
+    after the closing ``]``, so a caching wrapper around it (see
+    ``fetch.get(stream=True)``) sees the whole body; a body that ends before
+    the ``]`` raises ``ValueError`` rather than yielding part of the array.
+    """
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    pos = 0
+    started = False
+    closed = False
+    for chunk in chunks:
+        buffer = buffer[pos:] + text_decoder.decode(chunk)
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buffer):
+                break
+            if closed:
+                raise ValueError("Unexpected data after the JSON array")
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ",":
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                closed = True
+                pos += 1
+                continue
+            try:
+                item, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # item continues in the next chunk
+            pos = end
+            yield item
+    if not started:
+        raise ValueError("Empty response")
+    if not closed:
+        raise ValueError("JSON array ended early")
+
+
+def bucket_games(records):
+    """Normalize raw game dicts into ``CatalogGame`` and group them by genre,
+    in a single pass."""
+    categories = {}
+    for game in records:
+        genre = sys.intern(game.get("genre", "other").lower())
+        bucket = categories.get(genre)
+        if bucket is None:
+            bucket = categories[genre] = []
+        bucket.append(CatalogGame(
+            title=game["title"],
+            link=game["game_url"] if "game_url" in game else game.get("link", "#"),
+            thumbnail=game["thumbnail"],
+            genre=genre,
+            store=sys.intern(game.get("store", "unknown"))
+        ))
+    return categories
+
+
+_index = {}
+_index_lock = threading.Lock()
+
+
+def genre_index(response):
+    """Build the genre index for a streamed ``fetch.get`` result.
+
+    The index is kept per URL and reused as is while the upstream keeps
+    answering 304, so an unchanged catalog is neither parsed nor regrouped.
+    """
+    if response.not_modified:
+        with _index_lock:
+            index = _index.get(response.url)
+        if index is not None:
+            return index
+
+    index = bucket_games(iter_json_array(response.iter_content()))
+    with _index_lock:
+        _index[response.url] = index
+    return index
@@ -0,0 +1,173 @@
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from catalog import CatalogGame, json_default
+from dedup import normalize_title
+
+# Fields whose change is reported for a game that stays listed
+WATCHED_FIELDS = ("end_date", "discountPercentage", "originalPrice", "finalPrice")
+
+# Published versions whose changes are kept for /api/changes
+HISTORY = 200
+
+
+def boot_version():
+    """First version number for a process that starts publishing from
+    scratch. Taken from the clock (in milliseconds), so every version of a
+    new process is above those of the one before it and clients holding
+    an old version get a reset rather than a diff against unrelated
+    snapshots."""
+    return int(time.time() * 1000)
+
+
+def _as_dict(game):
+    return game.to_dict() if isinstance(game, CatalogGame) else game
+
+
+def store_lists(payload):
+    """``{(section, store): games}`` for every game list in a payload.
+
+    Permanent games are listed per genre, so their "store" is the genre.
+    """
+    lists = {}
+    for section, value in payload.items():
+        if section == "temporary":
+            stores = {store: games for group in value.values() for store, games in group.items()}
+        elif section == "permanent":
+            stores = value.get("pc", {})
+        else:
+            stores = value
+        for store, games in stores.items():
+            lists[(section, store)] = games
+    return lists
+
+
+def _keyed(games):
+    keyed = {}
+    for game in games:
+        game = _as_dict(game)
+        keyed.setdefault(normalize_title(game.get("title")) or game.get("link"), game)
+    return keyed
+
+
+def _changed_fields(old, new):
+    fields = {}
+    for field in WATCHED_FIELDS:
+        if old.get(field) == new.get(field):
+            continue
+        # Guessed end dates move forward on every scrape, that is not news
+        if field == "end_date" and old.get("end_date_estimated") and new.get("end_date_estimated"):
+            continue
+        fields[field] = {"old": old.get(field), "new": new.get(field)}
+    return fields
+
+
+def diff_payloads(old, new):
+    """Keyed diff of two payloads: games added, removed or with a changed
+    end date or price, per store.
+
+    Sections missing from ``old`` are a first load, not a change, and are
+    skipped.
+    """
+    old_lists = store_lists(old)
+    events = []
+    for (section, store), games in store_lists(new).items():
+        if section not in old:
+            continue
+        before = _keyed(old_lists.get((section, store), []))
+        after = _keyed(games)
+        for key, game in after.items():
+            previous = before.get(key)
+            if previous is None:
+                events.append({"type": "added", "section": section, "store": store, "key": key, "game": game})
+                continue
+            fields = _changed_fields(previous, game)
+            if fields:
+                events.append({"type": "changed", "section": section, "store": store, "key": key,
+                               "game": game, "fields": fields})
+        for key, game in before.items():
+            if key not in after:
+                events.append({"type": "removed", "section": section, "store": store, "key": key, "game": game})
+    return events
+
+
+class ChangeLog:
+    """Diffs every published snapshot against the one before it.
+
+    ``record`` is meant to be a publish hook; it ignores versions older than
+    the last one it saw, so hooks racing each other can't rewind it.
+    ``since(version)`` returns the changes after ``version``, or asks the
+    client to refetch everything when those are no longer kept.
+    """
+
+    def __init__(self, history=HISTORY):
+        self.entries = deque(maxlen=history)  # (version, at, events), only non-empty diffs
+        self.payload = None
+        self.version = 0
+        self.baseline = None  # oldest version we can diff from
+        self.cond = threading.Condition()
+
+    def record(self, payload, meta):
+        version = meta["version"]
+        with self.cond:
+            if version <= self.version:
+                return
+            if self.payload is None:
+                self.baseline = version
+            else:
+                events = diff_payloads(self.payload, payload)
+                if events:
+                    if len(self.entries) == self.entries.maxlen:
+                        self.baseline = self.entries[0][0]
+                    self.entries.append((version, datetime.utcnow().isoformat(), events))
+            self.payload, self.version = payload, version
+            self.cond.notify_all()
+
+    def since(self, version):
+        """``{"version", "reset", "changes"}`` for everything after ``version``.
+
+        ``reset`` is True when the changes since ``version`` are no longer
+        (or not yet) known, or ``version`` comes from before a restart; the
+        client should refetch /api/free-games.
+        """
+        with self.cond:
+            reset = self.baseline is None or not self.baseline <= version <= self.version
+            changes = [] if reset else [
+                dict(event, version=entry_version, at=at)
+                for entry_version, at, events in self.entries if entry_version > version
+                for event in events
+            ]
+            return {"version": self.version, "reset": reset, "changes": changes}
+
+    def wait(self, version, timeout):
+        """Block until a version newer than ``version`` is recorded."""
+        with self.cond:
+            return self.cond.wait_for(lambda: self.version > version, timeout)
+
+    def stream(self, version, heartbeat=15):
+        """Server-Sent Events for every version after ``version``, forever.
+
+        A ``version`` we can't diff from (e.g. a ``Last-Event-ID`` from
+        before a restart) gets a reset event straight away; before the
+        first snapshot the reset waits for it.
+        """
+        update = self.since(version)
+        if update["reset"] and self.baseline is not None:
+            version = update["version"]
+            yield _event(update)
+        while True:
+            if not self.wait(version, heartbeat):
+                yield ": keep-alive\n\n"
+                continue
+            update = self.since(version)
+            version = update["version"]
+            if update["reset"] or update["changes"]:
+                yield _event(update)
+
+
+def _event(update):
+    data = json.dumps(update, default=json_default, separators=(",", ":"))
+    return f"id: {update['version']}\nevent: changes\ndata: {data}\n\n"
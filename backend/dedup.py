@@ -0,0 +1,105 @@
+import re
+import unicodedata
+
+# Store specific IDs found in links and thumbnail URLs. Matching on them
+# catches duplicates whose titles differ slightly between sources.
+APP_ID_PATTERNS = [
+    ("steam", re.compile(r"steampowered\.com/app/(\d+)|steamstatic\.com/steam/apps/(\d+)")),
+    ("gog", re.compile(r"gog\.com/(?:[a-z]{2}/)?game/([\w-]+)")),
+    ("epic", re.compile(r"epicgames\.com/[\w-]+/p/([\w-]+)")),
+    ("humble", re.compile(r"humblebundle\.com/store/([\w-]+)")),
+    ("itchio", re.compile(r"//([\w-]+\.itch\.io/[\w-]+)"))
+]
+
+_TRADEMARKS = re.compile(r"[™®©]")
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+# Thumbnails we only keep when nothing better turns up
+_SMALL_THUMBNAIL = re.compile(r"capsule_sm|_120\.|offer_image_small|/thumbnail")
+
+
+def normalize_title(title):
+    title = unicodedata.normalize("NFKD", _TRADEMARKS.sub("", title or "")).casefold()
+    return _NON_ALNUM.sub(" ", title).strip()
+
+
+def game_keys(game):
+    """Index keys for a game: its normalized title plus any store app IDs."""
+    keys = []
+    title = normalize_title(game.get("title"))
+    if title:
+        keys.append(("title", title))
+    for field in ("link", "thumbnail"):
+        value = game.get(field) or ""
+        for store, pattern in APP_ID_PATTERNS:
+            match = pattern.search(value)
+            if match:
+                keys.append((store, next(group for group in match.groups() if group)))
+    return keys
+
+
+def thumbnail_rank(url):
+    if not url:
+        return 0
+    return 1 if _SMALL_THUMBNAIL.search(url) else 2
+
+
+def merge_game(kept, other):
+    """Fold ``other`` into ``kept`` (a copy we own), keeping the best of each."""
+    if thumbnail_rank(other.get("thumbnail")) > thumbnail_rank(kept.get("thumbnail")):
+        kept["thumbnail"] = other["thumbnail"]
+    # A date the store published beats one we guessed
+    if kept.get("end_date_estimated") and other.get("end_date") and not other.get("end_date_estimated"):
+        kept["end_date"] = other["end_date"]
+        kept.pop("end_date_estimated", None)
+    # Prefer a direct store page over a CheapShark redirect
+    other_link = other.get("link") or ""
+    if "cheapshark.com/redirect" in (kept.get("link") or "") and other_link and "cheapshark.com" not in other_link:
+        kept["link"] = other_link
+    for field, value in other.items():
+        if value and not kept.get(field) and field != "end_date_estimated":
+            kept[field] = value
+
+
+def merge_games(games):
+    """Merge duplicates within one list of games in linear time.
+
+    Games are the same when they share a normalized title or a store app ID;
+    the first occurrence keeps its position.
+    """
+    merged = []
+    index = {}
+    for game in games:
+        keys = game_keys(game)
+        position = next((index[key] for key in keys if key in index), None)
+        if position is None:
+            position = len(merged)
+            merged.append(dict(game))
+        else:
+            merge_game(merged[position], game)
+        for key in keys:
+            index.setdefault(key, position)
+    return merged
+
+
+def dedupe_payload(payload):
+    """Merge duplicates in every store list of the payload.
+
+    Sale entries for games the same store is currently giving away are
+    dropped as well.
+    """
+    free_keys = {}
+    for stores in payload.get("temporary", {}).values():  # per platform group
+        for store, games in stores.items():
+            stores[store] = merge_games(games)
+            free_keys[store] = {key for game in stores[store] for key in game_keys(game)}
+
+    sale = payload.get("sale")
+    if sale is not None:
+        for store, games in sale.items():
+            taken = free_keys.get(store, set())
+            sale[store] = [
+                game for game in merge_games(games)
+                if not any(key in taken for key in game_keys(game))
+            ]
+    return payload
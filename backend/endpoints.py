@@ -0,0 +1,40 @@
+from query import int_arg, paginate
+
+# The per-section endpoints, shared by the Flask (app.py) and ASGI
+# (asgi.py) servers. Each takes the snapshot payload and the query string
+# and returns ``(data, status)``; thumbnails are rewritten by the caller.
+
+# Store aliases accepted by /api/free-games/temporary/<store>
+STORE_ALIASES = {"epic": "epic_games", "itch.io": "itchio"}
+
+
+def temporary_store(payload, store, args):
+    # Stores of every platform group ("pc", and "console" when enabled)
+    games = {name: items for group in payload.get("temporary", {}).values() for name, items in group.items()}
+    store = STORE_ALIASES.get(store.lower(), store.lower())
+    if store not in games:
+        return {"error": f"Unknown store '{store}'", "stores": sorted(games)}, 404
+    return dict(paginate(games[store], args), store=store), 200
+
+
+def permanent(payload, args):
+    genres = payload.get("permanent", {}).get("pc", {})
+    genre = args.get("genre", "").lower()
+    if genre:
+        games = genres.get(genre, [])
+    else:
+        games = [game for name in sorted(genres) for game in genres[name]]
+    return dict(paginate(games, args), genres=sorted(genres)), 200
+
+
+def sale(payload, args):
+    stores = payload.get("sale", {})
+    store = args.get("store", "").lower()
+    min_discount = int_arg(args, "min_discount", 0)
+    games = [
+        game
+        for name in ([store] if store else sorted(stores))
+        for game in stores.get(name, [])
+        if (game.get("discountPercentage") or 0) >= min_discount
+    ]
+    return paginate(games, args), 200
@@ -0,0 +1,105 @@
+import heapq
+import os
+import time
+from datetime import datetime, timezone
+
+# How long after an offer ends its store is polled again, giving the store
+# time to put up the next one
+REPOLL_DELAY = int(os.environ.get("EXPIRY_REPOLL_DELAY", 60))
+
+# Sections holding offers that end; the free-to-play catalog never does
+SECTIONS = ("temporary", "sale")
+
+
+def to_iso(timestamp):
+    """Epoch seconds as the ISO format the frontend (and Epic) use."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def parse_iso(value):
+    """Epoch seconds of an ISO date or date-time (UTC unless it has an
+    offset). Raises ``ValueError`` for anything else."""
+    if not isinstance(value, str):
+        raise ValueError(f"Not a date: {value!r}")
+    moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def end_time(game):
+    """Epoch seconds at which ``game``'s offer ends, or None when the store
+    gave no end date (estimated ones don't count)."""
+    if not isinstance(game, dict) or game.get("end_date_estimated"):
+        return None
+    value = game.get("end_date")
+    if not value:
+        return None
+    try:
+        return parse_iso(value)
+    except ValueError:
+        return None
+
+
+def _lists(value, path=()):
+    """``(path, games)`` for every game list nested in ``value``."""
+    if isinstance(value, list):
+        yield path, value
+    elif isinstance(value, dict):
+        for key, child in value.items():
+            yield from _lists(child, path + (key,))
+
+
+def build_heap(payload):
+    """Heap of ``(end, path)`` for every offer with a real end date, where
+    ``path`` leads to its store's list in ``payload``."""
+    heap = []
+    for section in SECTIONS:
+        for path, games in _lists(payload.get(section), (section,)):
+            for game in games:
+                end = end_time(game)
+                if end is not None:
+                    heap.append((end, path))
+    heapq.heapify(heap)
+    return heap
+
+
+def next_expiry(heap):
+    return heap[0][0] if heap else None
+
+
+def prune(payload, heap, now=None):
+    """``payload`` without the offers that have ended by ``now``, popping
+    them off ``heap``. Only the lists that lose games are copied; when
+    nothing ended ``payload`` itself is returned."""
+    now = time.time() if now is None else now
+    paths = set()
+    while heap and heap[0][0] <= now:
+        paths.add(heapq.heappop(heap)[1])
+    if not paths:
+        return payload
+
+    pruned = dict(payload)
+    for path in paths:
+        parent = pruned
+        for key in path[:-1]:
+            parent[key] = dict(parent[key])
+            parent = parent[key]
+        games = parent[path[-1]]
+        parent[path[-1]] = [game for game in games if (end_time(game) or now + 1) > now]
+    return pruned
+
+
+def prune_now(payload):
+    """``prune`` without a heap kept around, for one-off payloads."""
+    return prune(payload, build_heap(payload))
+
+
+def next_end(result, after):
+    """Earliest real end date later than ``after`` among the offers of one
+    source result, or None."""
+    ends = [
+        end for _, games in _lists(result) for end in map(end_time, games)
+        if end is not None and end > after
+    ]
+    return min(ends, default=None)
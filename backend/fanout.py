@@ -0,0 +1,169 @@
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import health
+
+# One shared pool for the whole process so a burst of requests can't spawn
+# an unbounded number of scraper threads.
+MAX_WORKERS = int(os.environ.get("FANOUT_WORKERS", 16))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="fanout")
+
+
+def _timed(registry, name, fn, timeout):
+    start = time.monotonic()
+    try:
+        value = fn(timeout=timeout)
+        error = None
+    except Exception as e:
+        value = None
+        error = e
+    elapsed = time.monotonic() - start
+    # Recorded here rather than in gather so calls that outlive the
+    # deadline still count, with their real latency
+    registry.record(name, error is None, elapsed, error)
+    return elapsed, value, error
+
+
+async def _timed_async(registry, name, fn, timeout):
+    start = time.monotonic()
+    try:
+        value = await fn(timeout=timeout)
+        error = None
+    except asyncio.CancelledError:
+        # Not the source's fault; free a half-open probe for the next call
+        registry.release(name)
+        raise
+    except Exception as e:
+        value = None
+        error = e
+    elapsed = time.monotonic() - start
+    registry.record(name, error is None, elapsed, error)
+    return elapsed, value, error
+
+
+def _outcome(name, outcome, results):
+    """Status entry of one finished call, adding its value to ``results``."""
+    elapsed, value, error = outcome
+    if error is not None:
+        print(f"{name} fetch failed: {error}")
+        status = "error"
+    else:
+        results[name] = value
+        status = "ok" if value else "empty"
+    return {"status": status, "elapsed_ms": round(elapsed * 1000)}
+
+
+class FanOut:
+    """Run named fetchers concurrently under one shared deadline.
+
+    Sources can be submitted at any point before ``gather``; ``result`` lets
+    a caller wait on one source early (e.g. to decide on fallbacks) without
+    waiting for the rest. Sources still running at the deadline are reported
+    as timed out and ignored - their threads finish in the background.
+
+    Fetchers are called with a ``timeout`` keyword learned from the source's
+    recent latencies, and sources whose circuit breaker is open in
+    ``registry`` are not called at all.
+    """
+
+    def __init__(self, deadline, registry=None):
+        self.start = time.monotonic()
+        self.deadline = self.start + max(deadline, 0)
+        self.registry = registry or health.registry
+        self.futures = {}
+        self.rejected = set()
+
+    def remaining(self):
+        return max(self.deadline - time.monotonic(), 0)
+
+    def submit(self, name, fn):
+        if not self.registry.allow(name):
+            self.rejected.add(name)
+            return
+        timeout = self.registry.timeout_for(name)
+        # Run in a copy of our context so the caller's trace sees the spans
+        context = contextvars.copy_context()
+        self.futures[name] = _executor.submit(context.run, _timed, self.registry, name, fn, timeout)
+
+    def result(self, name, default=None):
+        if name not in self.futures:
+            return default
+        try:
+            _, value, error = self.futures[name].result(timeout=self.remaining())
+        except FutureTimeout:
+            return default
+        return default if error is not None else value
+
+    def gather(self):
+        """Wait for the deadline and return ``(results, meta)``.
+
+        ``results`` only holds the sources that finished without raising;
+        ``meta`` has a status ("ok", "empty", "error", "timeout" or "open"
+        when the breaker turned the call away) and the elapsed time for every
+        source.
+        """
+        done, _ = wait(self.futures.values(), timeout=self.remaining())
+
+        results = {}
+        meta = {name: {"status": "open", "elapsed_ms": 0} for name in self.rejected}
+        for name, future in self.futures.items():
+            if future not in done:
+                # A call that never started won't record, so give back its
+                # probe or the breaker would stay half-open for good
+                if future.cancel():
+                    self.registry.release(name)
+                meta[name] = {
+                    "status": "timeout",
+                    "elapsed_ms": round((time.monotonic() - self.start) * 1000)
+                }
+                continue
+
+            meta[name] = _outcome(name, future.result(), results)
+
+        return results, meta
+
+
+class AsyncFanOut(FanOut):
+    """``FanOut`` for the event loop: fetchers are coroutine functions,
+    run as tasks on the running loop, and ``result``/``gather`` are awaited.
+    Tasks still running at the deadline carry on in the background."""
+
+    def submit(self, name, fn):
+        if not self.registry.allow(name):
+            self.rejected.add(name)
+            return
+        timeout = self.registry.timeout_for(name)
+        self.futures[name] = asyncio.create_task(_timed_async(self.registry, name, fn, timeout))
+
+    async def result(self, name, default=None):
+        task = self.futures.get(name)
+        if task is None:
+            return default
+        await asyncio.wait({task}, timeout=self.remaining())
+        if not task.done():
+            return default
+        _, value, error = task.result()
+        return default if error is not None else value
+
+    async def gather(self):
+        if self.futures:
+            await asyncio.wait(self.futures.values(), timeout=self.remaining())
+
+        results = {}
+        meta = {name: {"status": "open", "elapsed_ms": 0} for name in self.rejected}
+        for name, task in self.futures.items():
+            if not task.done():
+                meta[name] = {
+                    "status": "timeout",
+                    "elapsed_ms": round((time.monotonic() - self.start) * 1000)
+                }
+                continue
+            meta[name] = _outcome(name, task.result(), results)
+
+        return results, meta
+
@@ -0,0 +1,349 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Only needed for the async fetches of the ASGI server (see asgi.py)
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# urllib3 only decodes brotli when one of these is installed, so only ask
+# for it then
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+# Where validated responses are kept between runs; set to "" to keep them
+# in memory only
+CACHE_DIR = os.environ.get(
+    "HTTP_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".http_cache")
+)
+POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 8))
+
+# Send every upstream request to a stand-in server instead: with
+# "http://127.0.0.1:8000", https://itch.io/games/free is fetched from
+# http://127.0.0.1:8000/itch.io/games/free (see standin.py)
+UPSTREAM_OVERRIDE = os.environ.get("UPSTREAM_OVERRIDE", "")
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept-Encoding": ACCEPT_ENCODING
+}
+
+# Longest Retry-After a store gets honoured for; anything longer would hold
+# a fan-out thread past the round's deadline
+RETRY_AFTER_MAX = 2
+
+
+class CappedRetry(Retry):
+    """``Retry`` that sleeps at most ``RETRY_AFTER_MAX`` seconds, however
+    long the ``Retry-After`` of a 429/503 asks for."""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, RETRY_AFTER_MAX)
+
+
+RETRY = CappedRetry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=("GET",),
+    respect_retry_after_header=True,
+    raise_on_status=False
+)
+
+_sessions = {}
+_entries = {}
+_lock = threading.Lock()
+
+
+class FetchResult:
+    """What scrapers get back instead of a ``requests.Response``.
+
+    ``not_modified`` is True when the upstream answered 304 and the body was
+    served from the local cache. Results of ``get(..., stream=True)`` hold
+    the body as an iterator of chunks until ``content`` is first read.
+    ``bytes_read`` counts the body bytes handed out so far.
+    """
+
+    def __init__(self, url, status_code, headers, content=None, encoding=None, not_modified=False, chunks=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self._content = content
+        self._chunks = chunks
+        self.encoding = encoding or "utf-8"
+        self.not_modified = not_modified
+        self.bytes_read = len(content) if content is not None else 0
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = b"".join(self._chunks or ())
+            self._chunks = None
+            self.bytes_read += len(self._content)
+        return self._content
+
+    def iter_content(self, chunk_size=64 * 1024):
+        if self._chunks is not None:
+            chunks, self._chunks = self._chunks, None
+            for chunk in chunks:
+                self.bytes_read += len(chunk)
+                yield chunk
+            return
+        content = self.content
+        for start in range(0, len(content), chunk_size):
+            yield content[start:start + chunk_size]
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error for {self.url}")
+
+
+def session_for(url):
+    """Return the keep-alive session (and connection pool) for the URL's host."""
+    host = urlsplit(url).netloc
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=RETRY)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[host] = session
+    return session
+
+
+def get(url, params=None, headers=None, timeout=15, stream=False, cache=True, revalidate=True):
+    """GET ``url`` through the pooled session for its host.
+
+    Responses carrying an ETag or Last-Modified header are cached locally and
+    revalidated with If-None-Match/If-Modified-Since next time, so unchanged
+    pages cost a 304. Transient errors (429/5xx) are retried with backoff.
+    With ``stream=True`` the body is read (and cached) chunk by chunk as the
+    caller iterates ``iter_content()``. ``cache=False`` skips the local cache
+    for bodies that are kept elsewhere (e.g. images, see thumbnails.py);
+    ``revalidate=False`` still caches the response but sends no validators.
+    """
+    full_url, key = _target(url, params)
+    entry = _load_entry(key) if cache and revalidate else None
+    request_headers = _request_headers(headers, entry)
+
+    response = session_for(full_url).get(full_url, headers=request_headers, timeout=timeout, stream=stream)
+
+    if response.status_code == 304 and entry:
+        response.close()
+        content = _load_body(key, entry)
+        if content is not None:
+            return FetchResult(full_url, 200, response.headers, content, entry.get("encoding"), not_modified=True)
+        # Body went missing from disk, fetch it again without validators
+        _forget(key)
+        return get(url, params=params, headers=headers, timeout=timeout, stream=stream, cache=cache,
+                   revalidate=False)
+
+    new_entry = _new_entry(full_url, response) if cache else None
+    if stream:
+        chunks = response.iter_content(64 * 1024)
+        if new_entry:
+            chunks = _store_stream(key, new_entry, chunks)
+        return FetchResult(full_url, response.status_code, response.headers, encoding=response.encoding, chunks=chunks)
+
+    if new_entry:
+        _store_entry(key, new_entry, response.content)
+    return FetchResult(full_url, response.status_code, response.headers, response.content, response.encoding)
+
+
+def async_client():
+    """An ``httpx.AsyncClient`` for ``aget``; connection errors are retried
+    by its transport."""
+    return httpx.AsyncClient(follow_redirects=True, transport=httpx.AsyncHTTPTransport(retries=RETRY.total))
+
+
+async def aget(client, url, params=None, headers=None, timeout=15, revalidate=True):
+    """``get`` for the event loop, over an ``httpx.AsyncClient``.
+
+    Shares the local cache and revalidation with ``get`` and retries the
+    same statuses with the same backoff. Bodies are always read whole.
+    """
+    full_url, key = _target(url, params)
+    entry = _load_entry(key) if revalidate else None
+    request_headers = _request_headers(headers, entry)
+
+    for attempt in range(RETRY.total + 1):
+        response = await client.get(full_url, headers=request_headers, timeout=timeout)
+        if response.status_code not in RETRY.status_forcelist or attempt == RETRY.total:
+            break
+        await asyncio.sleep(RETRY.backoff_factor * 2 ** attempt)
+
+    if response.status_code == 304 and entry:
+        content = _load_body(key, entry)
+        if content is not None:
+            return FetchResult(full_url, 200, response.headers, content, entry.get("encoding"), not_modified=True)
+        _forget(key)
+        return await aget(client, url, params=params, headers=headers, timeout=timeout, revalidate=False)
+
+    new_entry = _new_entry(full_url, response)
+    if new_entry:
+        _store_entry(key, new_entry, response.content)
+    return FetchResult(full_url, response.status_code, response.headers, response.content, response.encoding)
+
+
+def _target(url, params):
+    """The URL to request (after ``UPSTREAM_OVERRIDE``) and its cache key."""
+    full_url = requests.Request("GET", url, params=params).prepare().url
+    if UPSTREAM_OVERRIDE:
+        full_url = UPSTREAM_OVERRIDE.rstrip("/") + "/" + full_url.split("://", 1)[1]
+    return full_url, hashlib.sha1(full_url.encode("utf-8")).hexdigest()
+
+
+def _request_headers(headers, entry):
+    request_headers = dict(DEFAULT_HEADERS, **(headers or {}))
+    if entry:
+        if entry.get("etag"):
+            request_headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            request_headers["If-Modified-Since"] = entry["last_modified"]
+    return request_headers
+
+
+def _new_entry(full_url, response):
+    """Cache entry for a response that can be revalidated, else None."""
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if response.status_code != 200 or not (etag or last_modified):
+        return None
+    return {
+        "url": full_url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "encoding": response.encoding
+    }
+
+
+def _path(key, suffix):
+    return os.path.join(CACHE_DIR, key + suffix)
+
+
+def _load_entry(key):
+    with _lock:
+        if key in _entries:
+            return _entries[key]
+    entry = None
+    if CACHE_DIR:
+        try:
+            with open(_path(key, ".json"), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+    with _lock:
+        _entries[key] = entry
+    return entry
+
+
+def _load_body(key, entry):
+    if not CACHE_DIR:
+        return entry.get("body")
+    try:
+        with open(_path(key, ".body"), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _forget(key):
+    """Drop the cached entry of ``key``, in memory and on disk."""
+    with _lock:
+        _entries.pop(key, None)
+    if CACHE_DIR:
+        for suffix in (".json", ".body"):
+            try:
+                os.remove(_path(key, suffix))
+            except OSError:
+                pass
+
+
+def _store_entry(key, entry, content):
+    if CACHE_DIR:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            _write_atomic(_path(key, ".body"), content)
+            _write_atomic(_path(key, ".json"), json.dumps(entry).encode("utf-8"))
+        except OSError as e:
+            print("HTTP cache write error:", e)
+            return
+    else:
+        entry = dict(entry, body=content)
+    with _lock:
+        _entries[key] = entry
+
+
+def _store_stream(key, entry, chunks):
+    """Pass ``chunks`` through, caching the body once it was read completely."""
+    if not CACHE_DIR:
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        with _lock:
+            _entries[key] = dict(entry, body=b"".join(parts))
+        return
+
+    body_path = _path(key, ".body")
+    tmp_path = f"{body_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        f = open(tmp_path, "wb")
+    except OSError as e:
+        print("HTTP cache write error:", e)
+        yield from chunks
+        return
+
+    complete = False
+    try:
+        with f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        complete = True
+    finally:
+        if not complete:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    os.replace(tmp_path, body_path)
+    _write_atomic(_path(key, ".json"), json.dumps(entry).encode("utf-8"))
+    with _lock:
+        _entries[key] = entry
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
@@ -0,0 +1,17 @@
+# gunicorn -c gunicorn.conf.py app:app
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+# Threads keep a worker answering while it streams /api/changes/stream.
+# Every open stream holds a thread until its client leaves, so at most
+# CHANGE_STREAMS_MAX (default 4) are let in per worker; keep it below
+# GUNICORN_THREADS or streams can starve the other requests
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+# Every worker imports the app after the fork, since the refresh threads
+# wouldn't survive it; one of them wins the refresh lock and the others
+# read its snapshot (see shared.py)
+preload_app = False
+os.environ.setdefault("SHARED_SNAPSHOT", "1")
@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Consecutive failures that open a source's breaker
+FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURES", 3))
+# Seconds an open breaker rejects calls before letting one probe through;
+# doubled every time the probe fails, up to MAX_COOLDOWN
+COOLDOWN = float(os.environ.get("BREAKER_COOLDOWN", 300))
+MAX_COOLDOWN = 60 * 60
+# Per-call timeouts are learned from recent latencies: TIMEOUT_FACTOR times
+# the p95 of the last successful calls, kept within these bounds
+TIMEOUT_MIN = float(os.environ.get("SOURCE_TIMEOUT_MIN", 3))
+TIMEOUT_MAX = float(os.environ.get("SOURCE_TIMEOUT_MAX", 15))
+TIMEOUT_FACTOR = 2
+# Samples needed before the learned timeout replaces TIMEOUT_MAX
+MIN_SAMPLES = 5
+# Calls remembered per source
+WINDOW = 50
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def _iso(timestamp):
+    return datetime.utcfromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+class SourceHealth:
+    """Breaker state and recent outcomes of one source."""
+
+    def __init__(self, cooldown):
+        self.state = CLOSED
+        self.failures = 0  # consecutive
+        self.opened_at = 0
+        self.cooldown = cooldown
+        self.probing = False
+        self.outcomes = deque(maxlen=WINDOW)
+        self.latencies = deque(maxlen=WINDOW)  # successful calls only
+        self.calls = 0
+        self.rejected = 0
+        self.last_error = None
+        self.last_success = None
+        self.last_failure = None
+
+
+class HealthRegistry:
+    """Circuit breaker and latency tracker for every source.
+
+    A source's breaker opens after ``threshold`` consecutive failures; while
+    open, ``allow`` turns calls away so a dead upstream costs nothing. Once
+    the cooldown has passed a single probe is let through (half-open): a
+    success closes the breaker, a failure opens it again for twice as long.
+    """
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN,
+                 timeout_min=TIMEOUT_MIN, timeout_max=TIMEOUT_MAX):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.timeout_min = timeout_min
+        self.timeout_max = timeout_max
+        self.sources = {}
+        self.lock = threading.Lock()
+
+    def _get(self, name):
+        source = self.sources.get(name)
+        if source is None:
+            source = self.sources[name] = SourceHealth(self.cooldown)
+        return source
+
+    def allow(self, name):
+        """Whether ``name`` may be called now. A True answer in half-open
+        state reserves the single probe, so it must be followed by ``record``
+        or, when the call never happens, ``release``."""
+        with self.lock:
+            source = self._get(name)
+            if source.state == OPEN:
+                if time.monotonic() - source.opened_at < source.cooldown:
+                    source.rejected += 1
+                    return False
+                source.state = HALF_OPEN
+            if source.state == HALF_OPEN:
+                if source.probing:
+                    source.rejected += 1
+                    return False
+                source.probing = True
+            return True
+
+    def release(self, name):
+        """Give back the probe ``allow`` reserved for a call that never ran
+        (e.g. cancelled while still queued), so the next call can probe."""
+        with self.lock:
+            self._get(name).probing = False
+
+    def record(self, name, ok, elapsed, error=None):
+        with self.lock:
+            source = self._get(name)
+            source.calls += 1
+            source.outcomes.append(ok)
+            probe, source.probing = source.probing, False
+            if ok:
+                source.latencies.append(elapsed)
+                source.failures = 0
+                source.state = CLOSED
+                source.cooldown = self.cooldown
+                source.last_success = time.time()
+                return
+
+            source.failures += 1
+            source.last_error = f"{type(error).__name__}: {error}" if error else None
+            source.last_failure = time.time()
+            if probe:
+                source.cooldown = min(source.cooldown * 2, MAX_COOLDOWN)
+            if probe or source.failures >= self.threshold:
+                if source.state != OPEN:
+                    print(f"Circuit breaker for {name} opened after {source.failures} failures")
+                source.state = OPEN
+                source.opened_at = time.monotonic()
+
+    def timeout_for(self, name):
+        """Per-call timeout for ``name``, in seconds."""
+        with self.lock:
+            latencies = list(self._get(name).latencies)
+        if len(latencies) < MIN_SAMPLES:
+            return self.timeout_max
+        timeout = percentile(latencies, 0.95) * TIMEOUT_FACTOR
+        return min(max(timeout, self.timeout_min), self.timeout_max)
+
+    def snapshot(self):
+        """Health report of every source seen so far."""
+        report = {}
+        for name in sorted(self.sources):
+            timeout = self.timeout_for(name)
+            with self.lock:
+                source = self.sources[name]
+                outcomes = list(source.outcomes)
+                latencies = list(source.latencies)
+                entry = {
+                    "state": source.state,
+                    "consecutive_failures": source.failures,
+                    "calls": source.calls,
+                    "rejected": source.rejected,
+                    "success_rate": round(sum(outcomes) / len(outcomes), 3) if outcomes else None,
+                    "timeout_s": round(timeout, 2),
+                    "last_success": _iso(source.last_success),
+                    "last_failure": _iso(source.last_failure),
+                    "last_error": source.last_error
+                }
+                if source.state == OPEN:
+                    retry_in = source.cooldown - (time.monotonic() - source.opened_at)
+                    entry["retry_in_s"] = max(round(retry_in), 0)
+            for label, fraction in (("p50", 0.5), ("p95", 0.95)):
+                value = percentile(latencies, fraction)
+                entry[f"latency_{label}_ms"] = round(value * 1000) if value is not None else None
+            report[name] = entry
+        return report
+
+
+# Shared by every fan-out in the process
+registry = HealthRegistry()
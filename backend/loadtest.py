@@ -0,0 +1,234 @@
+"""Load test of the API under concurrent clients.
+
+Starts the server in a subprocess against the local stand-in stores
+(standin.py) and hits it from ``--concurrency`` client threads:
+
+    python loadtest.py --server flask --concurrency 8,32 --duration 15
+    python loadtest.py --server flask,asgi --upstream-delay 200 --env BACKGROUND_REFRESH=0
+    python loadtest.py --url http://localhost:5000 --p95 150 --p99 400
+
+Reports throughput and p50/p95/p99 latency per path and exits with status 1
+when the overall latency or error rate of any run is over budget.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmark import count_items, percentile
+from standin import StandInServer
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# How each server mode is started; the port comes from PORT
+SERVERS = {
+    "flask": [sys.executable, "app.py"],
+    "gunicorn": ["gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+    "asgi": [sys.executable, "asgi.py"]
+}
+
+DEFAULT_PATHS = ",".join([
+    "/api/free-games",
+    "/api/free-games/temporary/epic",
+    "/api/permanent?limit=50",
+    "/api/sale?min_discount=50",
+    "/api/search?q=st&limit=20"
+])
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, upstream, extra_env, log):
+    """Start ``mode`` on a free port and return ``(process, base_url)``."""
+    workdir = tempfile.mkdtemp()
+    port = free_port()
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        UPSTREAM_OVERRIDE=upstream,
+        HTTP_CACHE_DIR="",
+        SNAPSHOT_DB=os.path.join(workdir, "snapshots.db"),
+        SHARED_SNAPSHOT_PATH=os.path.join(workdir, "snapshot.json"),
+        IMAGE_CACHE_DIR=os.path.join(workdir, "images")
+    )
+    env.update(extra_env)
+    process = subprocess.Popen(SERVERS[mode], cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return process, f"http://127.0.0.1:{port}"
+
+
+def wait_ready(base, timeout=60):
+    """Wait until the server answers with a snapshot that has games in it."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            response = requests.get(base + "/api/free-games", timeout=5)
+            if response.ok and count_items(response.json()):
+                return True
+        except (requests.RequestException, ValueError):
+            pass
+        time.sleep(0.25)
+    return False
+
+
+def run_load(base, paths, concurrency, duration, warmup):
+    """``[(path, seconds, ok)]`` of every request finished in the measured
+    window, plus its length in seconds."""
+    samples = []
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    def client(offset):
+        session = requests.Session()
+        i = offset
+        while True:
+            began = time.perf_counter()
+            if began >= stop_at:
+                return
+            path = paths[i % len(paths)]
+            i += 1
+            try:
+                response = session.get(base + path, timeout=30)
+                response.content
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            if began >= measure_from:
+                samples.append((path, time.perf_counter() - began, ok))
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, duration
+
+
+def summarize(paths, samples, elapsed):
+    rows = {}
+    by_path = {path: [] for path in paths}
+    for path, seconds, ok in samples:
+        by_path[path].append((seconds, ok))
+    by_path["all"] = [(seconds, ok) for _, seconds, ok in samples]
+    for path, entries in by_path.items():
+        timings = [seconds for seconds, _ in entries] or [0]
+        errors = sum(1 for _, ok in entries if not ok)
+        rows[path] = {
+            "requests": len(entries),
+            "rps": len(entries) / elapsed,
+            "p50_ms": percentile(timings, 50) * 1000,
+            "p95_ms": percentile(timings, 95) * 1000,
+            "p99_ms": percentile(timings, 99) * 1000,
+            "error_rate": errors / len(entries) if entries else 0
+        }
+    return rows
+
+
+def print_rows(rows):
+    print(f"{'path':<36}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for path, row in rows.items():
+        print(f"{path[:35]:<36}{row['requests']:>9}{row['rps']:>9.1f}{row['p50_ms']:>9.1f}"
+              f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['error_rate']:>8.1%}")
+
+
+def over_budget(row, args):
+    problems = []
+    for metric in ("p50", "p95", "p99"):
+        budget = getattr(args, metric)
+        if budget is not None and row[f"{metric}_ms"] > budget:
+            problems.append(f"{metric} {row[f'{metric}_ms']:.1f} ms > {budget:g} ms")
+    if row["error_rate"] > args.max_error_rate:
+        problems.append(f"error rate {row['error_rate']:.1%} > {args.max_error_rate:.1%}")
+    return problems
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--server", default="flask",
+                            help=f"comma separated server modes to start ({', '.join(SERVERS)})")
+    arg_parser.add_argument("--url", help="load an already running server instead of starting one")
+    arg_parser.add_argument("--paths", default=DEFAULT_PATHS, help="comma separated paths, requested in turn")
+    arg_parser.add_argument("--concurrency", default="16", help="comma separated client counts")
+    arg_parser.add_argument("--duration", type=float, default=10, help="measured seconds per run")
+    arg_parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds before each run")
+    arg_parser.add_argument("--scale", type=int, default=1, help="fixture scale factor")
+    arg_parser.add_argument("--upstream-delay", type=float, default=0,
+                            help="milliseconds the stand-in stores take per response")
+    arg_parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                            help="extra environment for the started server")
+    arg_parser.add_argument("--p50", type=float, help="p50 budget in ms")
+    arg_parser.add_argument("--p95", type=float, help="p95 budget in ms")
+    arg_parser.add_argument("--p99", type=float, help="p99 budget in ms")
+    arg_parser.add_argument("--max-error-rate", type=float, default=0.01)
+    arg_parser.add_argument("--save", help="write the results to this JSON file")
+    args = arg_parser.parse_args()
+
+    paths = [path.strip() for path in args.paths.split(",") if path.strip()]
+    levels = [int(c) for c in args.concurrency.split(",")]
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    modes = [args.url] if args.url else args.server.split(",")
+
+    standin = None
+    if not args.url:
+        standin = StandInServer(scale=args.scale, delay=args.upstream_delay / 1000).start()
+
+    results = {}
+    failures = []
+    for mode in modes:
+        process = None
+        if args.url:
+            base = args.url.rstrip("/")
+        else:
+            log = tempfile.NamedTemporaryFile("w+", suffix=".log", delete=False)
+            try:
+                process, base = start_server(mode, standin.base_url, extra_env, log)
+            except OSError as e:
+                print(f"\nCould not start {mode}: {e}")
+                failures.append(f"{mode}: not started")
+                continue
+        try:
+            if not wait_ready(base):
+                print(f"\n{mode} did not come up, see {log.name}" if process else f"\n{base} is not answering")
+                failures.append(f"{mode}: not ready")
+                continue
+            results[mode] = {}
+            for concurrency in levels:
+                print(f"\n{mode}, {concurrency} clients")
+                samples, elapsed = run_load(base, paths, concurrency, args.duration, args.warmup)
+                rows = summarize(paths, samples, elapsed)
+                print_rows(rows)
+                results[mode][str(concurrency)] = rows
+                failures.extend(f"{mode} x{concurrency}: {problem}" for problem in over_budget(rows["all"], args))
+        finally:
+            if process:
+                process.terminate()
+                process.wait(timeout=10)
+
+    if standin:
+        standin.shutdown()
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if failures:
+        print("\nOver budget:")
+        for line in failures:
+            print("  " + line)
+        sys.exit(1)
+    print("\nAll runs within budget")
+
+
+if __name__ == "__main__":
+    main()
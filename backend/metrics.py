@@ -0,0 +1,234 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Trace every request (and background refresh round), not just those
+# sending an X-Trace header
+TRACE_ALL = os.environ.get("TRACING", "0") == "1"
+
+# Prometheus-style metrics without extra dependencies; render() produces
+# the text exposition format served at /metrics
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _number(value):
+    """Sample value in full: integers exactly, floats with every digit
+    (``:g`` would freeze large counters at 6 significant digits)."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    value = float(value)
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, key)} {_number(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += 1
+            entry[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, count, total) in sorted(self.values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_labels(self.labels, key, [('le', f'{bound:g}')])} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, [('le', '+Inf')])} {count}")
+                lines.append(f"{self.name}_count{_labels(self.labels, key)} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(total)}")
+        return lines
+
+
+REGISTRY = []
+
+STAGE_SECONDS = Histogram(
+    "scraper_stage_seconds", "Time spent per source and stage (fetch waits for the response "
+    "headers; parse includes reading streamed bodies)", ["source", "stage"]
+)
+PIPELINE_SECONDS = Histogram(
+    "pipeline_stage_seconds", "Time spent building the payload, per stage", ["stage"]
+)
+BYTES = Counter("scraper_bytes_total", "Response bytes read per source", ["source"])
+ITEMS = Gauge("scraper_items", "Games in the last successful result per source", ["source"])
+ERRORS = Counter("scraper_errors_total", "Failed fetches per source and exception type", ["source", "type"])
+NOT_MODIFIED = Counter("scraper_not_modified_total", "Responses revalidated with a 304 per source", ["source"])
+HTTP_SECONDS = Histogram("http_request_seconds", "API request latency per route", ["route"])
+HTTP_REQUESTS = Counter("http_requests_total", "API requests per route and status", ["route", "status"])
+BREAKER_STATE = Gauge(
+    "source_breaker_state", "Circuit breaker state per source (0 closed, 1 half-open, 2 open)", ["source"]
+)
+
+# Recorded by the process that refreshes the sources; with a shared snapshot
+# followers serve the leader's (see app.py)
+SOURCE_METRICS = [STAGE_SECONDS, PIPELINE_SECONDS, BYTES, ITEMS, ERRORS, NOT_MODIFIED]
+
+
+def render(metrics=None):
+    lines = []
+    for metric in REGISTRY if metrics is None else metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def count_items(result):
+    """Games in a source result, whether a list or lists keyed by store/genre."""
+    if isinstance(result, dict):
+        return sum(count_items(value) for value in result.values())
+    if isinstance(result, list):
+        return len(result)
+    return 0
+
+
+class Trace:
+    """Spans recorded while one request (or refresh round) runs."""
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.end = None
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def add(self, name, start, end, **attrs):
+        with self.lock:
+            self.spans.append(dict(
+                attrs, name=name,
+                start_ms=round((start - self.start) * 1000, 2),
+                duration_ms=round((end - start) * 1000, 2)
+            ))
+
+    def to_dict(self):
+        with self.lock:
+            spans = sorted(self.spans, key=lambda span: span["start_ms"])
+        end = self.end or time.perf_counter()
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round((end - self.start) * 1000, 2),
+            "spans": spans
+        }
+
+    def finish(self):
+        self.end = time.perf_counter()
+        recent_traces.append(self)
+
+    def server_timing(self):
+        """The spans as a ``Server-Timing`` header value."""
+        with self.lock:
+            spans = list(self.spans)
+        return ", ".join(
+            f"{span['name'].replace(':', '.').replace(' ', '_')};dur={span['duration_ms']}" for span in spans
+        )
+
+
+# Trace of the code running now; FanOut copies it into its worker threads
+current_trace = contextvars.ContextVar("current_trace", default=None)
+recent_traces = deque(maxlen=50)
+
+
+@contextmanager
+def trace(name):
+    """Record every span opened inside the block into a new trace."""
+    new = Trace(name)
+    token = current_trace.set(new)
+    try:
+        yield new
+    finally:
+        current_trace.reset(token)
+        new.finish()
+
+
+@contextmanager
+def span(name, **attrs):
+    active = current_trace.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if active is not None:
+            active.add(name, start, time.perf_counter(), **attrs)
+
+
+@contextmanager
+def stage(name, source=None):
+    """Time one stage into the histograms and the active trace."""
+    start = time.perf_counter()
+    try:
+        with span(f"{name}:{source}" if source else name):
+            yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if source:
+            STAGE_SECONDS.observe(elapsed, source=source, stage=name)
+        else:
+            PIPELINE_SECONDS.observe(elapsed, stage=name)
@@ -0,0 +1,67 @@
+import os
+import threading
+
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = "lxml"
+except ImportError:
+    DEFAULT_PARSER = "html.parser"
+
+# Any BeautifulSoup tree builder works here ("lxml", "html.parser", "html5lib")
+HTML_PARSER = os.environ.get("HTML_PARSER", DEFAULT_PARSER)
+
+# Only build the parts of the page the scrapers read (see ``make_soup``)
+PARTIAL_PARSING = os.environ.get("HTML_PARTIAL_PARSING", "1") != "0"
+
+_parsed = {}
+_parsed_lock = threading.Lock()
+
+
+def make_soup(html, only=None):
+    """Parse ``html`` with the configured backend.
+
+    ``only`` is a ``SoupStrainer`` for the result containers; everything
+    outside of them (navigation, scripts, footers) is skipped instead of
+    being turned into a tree.
+    """
+    if not PARTIAL_PARSING:
+        only = None
+    return BeautifulSoup(html, HTML_PARSER, parse_only=only)
+
+
+def selector(css):
+    """Compile a CSS selector once so per-card lookups skip re-parsing it."""
+    return soupsieve.compile(css)
+
+
+def strainer(name=None, class_=None, **attrs):
+    """Build a ``SoupStrainer``; ``class_`` matches one class among several.
+
+    While the page is being parsed the class attribute is still the raw
+    string, so a plain ``class_="game_cell"`` would miss
+    ``class="game_cell has_cover"``.
+    """
+    if class_ is not None:
+        attrs["class_"] = lambda value: bool(value) and class_ in (
+            value.split() if isinstance(value, str) else value
+        )
+    return SoupStrainer(name, **attrs)
+
+
+def parse_response(response, parser):
+    """Run ``parser`` on a ``fetch.get`` result, reusing the last result for
+    the same URL when the upstream answered 304."""
+    key = (parser.__name__, response.url)
+    if response.not_modified:
+        with _parsed_lock:
+            games = _parsed.get(key)
+        if games is not None:
+            return [dict(game) for game in games]
+
+    games = parser(response.text)
+    with _parsed_lock:
+        _parsed[key] = games
+    return [dict(game) for game in games]
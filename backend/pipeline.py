@@ -0,0 +1,175 @@
+import asyncio
+import os
+import time
+from functools import partial
+
+from dedup import dedupe_payload
+from fanout import AsyncFanOut, FanOut
+from metrics import stage
+from snapshots import get_store
+from scraper import load_backup_data  # also registers every store source
+from sources import all_sources, enabled_sources, get_source, rivals
+
+# Global budget for one /api/free-games request, in seconds
+DEADLINE = float(os.environ.get("FREE_GAMES_DEADLINE", 20))
+
+SECTION_NAMES = ("permanent", "temporary", "sale")
+
+# Everything below is derived from the enabled sources (see scraper.py).
+# Fetchers raise on failure (and take the per-call ``timeout``) so the
+# fan-out can track each source's health.
+SOURCES = {s.name: s.load for s in enabled_sources() if not s.fallback}
+
+SECTIONS = {
+    section: [s.name for s in enabled_sources(section) if not s.fallback]
+    for section in SECTION_NAMES
+}
+
+# Direct scrapers, only run for stores their rivals (CheapShark) came back
+# empty for
+FALLBACK_SOURCES = {s.name: s.load for s in enabled_sources() if s.fallback}
+
+# Background refresh interval per source, in seconds
+INTERVALS = {s.name: s.interval for s in enabled_sources()}
+
+
+def fallback_needed(name, results, status):
+    """Whether a fallback scraper has to run given the current results."""
+    source = get_source(name)
+    if not source.fallback:
+        return True
+    others = rivals(source)
+    if any(status.get(other.name, {}).get("status") == "pending" for other in others):
+        return False
+    return any(
+        not any(other.games(results.get(other.name), store) for other in others if store in other.stores)
+        for store in source.stores
+    )
+
+
+def collect_free_games(sections=None, deadline=DEADLINE):
+    """Fetch sources concurrently and build the /api/free-games payload.
+
+    Only the sources behind ``sections`` (default: all of them) are fetched.
+    Returns ``(payload, meta)`` where ``meta`` reports per-source status and
+    timing. Sources that miss the deadline are left out (temporary stores
+    fall back to the backup file).
+    """
+    sections = list(sections or SECTIONS)
+    fanout = FanOut(deadline)
+    for section in sections:
+        for name in SECTIONS[section]:
+            fanout.submit(name, SOURCES[name])
+
+    # Start the fallback scrapers as soon as the sources they back up answer
+    # instead of waiting for the slowest source
+    for source in enabled_sources():
+        if source.fallback and source.section in sections:
+            early = {other.name: fanout.result(other.name) for other in rivals(source)}
+            if fallback_needed(source.name, early, {}):
+                fanout.submit(source.name, source.load)
+
+    results, sources_meta = fanout.gather()
+    with stage("save"):
+        get_store().save_results(results)
+    meta = {
+        "elapsed_ms": round((time.monotonic() - fanout.start) * 1000),
+        "partial": any(m["status"] == "timeout" for m in sources_meta.values()),
+        "sources": sources_meta
+    }
+    return assemble(results, sections), meta
+
+
+async def collect_free_games_async(client, sections=None, deadline=DEADLINE):
+    """``collect_free_games`` for the event loop: every source is fetched
+    with ``Source.aload`` over ``client`` (an ``httpx.AsyncClient``), and
+    saving and assembling run in a worker thread."""
+    sections = list(sections or SECTIONS)
+    fanout = AsyncFanOut(deadline)
+    for section in sections:
+        for name in SECTIONS[section]:
+            fanout.submit(name, partial(get_source(name).aload, client))
+
+    for source in enabled_sources():
+        if source.fallback and source.section in sections:
+            early = {other.name: await fanout.result(other.name) for other in rivals(source)}
+            if fallback_needed(source.name, early, {}):
+                fanout.submit(source.name, partial(source.aload, client))
+
+    results, sources_meta = await fanout.gather()
+
+    def build():
+        with stage("save"):
+            get_store().save_results(results)
+        return assemble(results, sections)
+
+    payload = await asyncio.to_thread(build)
+    meta = {
+        "elapsed_ms": round((time.monotonic() - fanout.start) * 1000),
+        "partial": any(m["status"] == "timeout" for m in sources_meta.values()),
+        "sources": sources_meta
+    }
+    return payload, meta
+
+
+def with_last_good(results, sections):
+    """Fill in sources that failed or timed out with their last saved result.
+    Fallbacks are only filled in while their rivals leave a store empty."""
+    store = get_store()
+    filled = dict(results)
+    for source in enabled_sources():
+        if source.section in sections and not filled.get(source.name):
+            if source.fallback and not fallback_needed(source.name, filled, {}):
+                continue
+            value = store.last_good(source.name)
+            if value:
+                filled[source.name] = value
+    return filled
+
+
+def assemble(results, sections=None):
+    sections = sections or SECTIONS
+    with stage("last_good"):
+        results = with_last_good(results, sections)
+    with stage("assemble"):
+        payload = {
+            section: assemble_section(section, results)
+            for section in SECTION_NAMES if section in sections
+        }
+        if "temporary" in payload:
+            fill_from_backup(payload["temporary"].setdefault("pc", {}))
+    with stage("dedupe"):
+        return dedupe_payload(payload)
+
+
+def assemble_section(section, results):
+    """Put every source's games under its store. The games of all sources
+    filling one list store are concatenated, highest priority first, for
+    ``dedupe_payload`` to merge; of other stores (the genre index) the
+    highest priority one with games wins."""
+    sources = [s for s in all_sources() if s.enabled and s.section == section]
+    assembled = {}
+    # Registration order fixes the order of the stores
+    for source in sources:
+        target = assembled if source.group is None else assembled.setdefault(source.group, {})
+        for store in source.stores:
+            target.setdefault(store, source.empty())
+    for source in sorted(sources, key=lambda s: s.priority):
+        target = assembled if source.group is None else assembled[source.group]
+        for store in source.stores:
+            games = source.games(results.get(source.name), store)
+            if not target[store]:
+                target[store] = games
+            elif isinstance(games, list) and games:
+                target[store] = target[store] + games
+    return assembled
+
+
+def fill_from_backup(temporary):
+    # If any store has no games, try loading from backup
+    if any(not games for games in temporary.values()):
+        backup_data = load_backup_data()
+        for store in temporary:
+            if not temporary[store]:
+                temporary[store] = backup_data['pc'].get(store, [])
+    return temporary
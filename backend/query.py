@@ -0,0 +1,70 @@
+import base64
+import json
+
+from catalog import CatalogGame
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class QueryError(ValueError):
+    """Bad query string parameter, reported to the client as a 400."""
+
+
+def int_arg(args, name, default=None, minimum=None, maximum=None):
+    value = args.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise QueryError(f"'{name}' must be an integer")
+    if minimum is not None and value < minimum:
+        raise QueryError(f"'{name}' must be at least {minimum}")
+    if maximum is not None:
+        value = min(value, maximum)
+    return value
+
+
+def encode_cursor(offset):
+    raw = json.dumps({"o": offset}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        offset = int(json.loads(raw)["o"])
+    except (ValueError, KeyError, TypeError):
+        raise QueryError("invalid 'cursor'")
+    if offset < 0:
+        raise QueryError("invalid 'cursor'")
+    return offset
+
+
+def select_fields(game, fields):
+    if isinstance(game, CatalogGame):
+        game = game.to_dict()
+    if not fields:
+        return game
+    return {field: game[field] for field in fields if field in game}
+
+
+def paginate(items, args):
+    """Slice ``items`` according to ``cursor`` (or ``page``), ``limit`` and
+    ``fields`` from the query string."""
+    limit = int_arg(args, "limit", DEFAULT_LIMIT, minimum=1, maximum=MAX_LIMIT)
+    if args.get("cursor"):
+        offset = decode_cursor(args["cursor"])
+    else:
+        offset = (int_arg(args, "page", 1, minimum=1) - 1) * limit
+    fields = [f for f in args.get("fields", "").split(",") if f]
+
+    page = items[offset:offset + limit]
+    next_offset = offset + limit
+    return {
+        "items": [select_fields(game, fields) for game in page],
+        "total": len(items),
+        "limit": limit,
+        "next_cursor": encode_cursor(next_offset) if next_offset < len(items) else None
+    }
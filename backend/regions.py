@@ -0,0 +1,182 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from datetime import datetime
+from functools import partial
+from urllib.parse import urlencode
+
+from cache import SnapshotCache
+from dedup import dedupe_payload
+from expiry import prune_now
+from fanout import FanOut
+from pipeline import DEADLINE
+from query import QueryError
+from responses import modified_at
+import shared
+from snapshots import get_store
+from sources import enabled_sources, get_source
+
+# The region the main snapshot is built for (the sources' declared params)
+DEFAULT_COUNTRY = "US"
+DEFAULT_LOCALE = "en-US"
+
+# Regions users may ask for; every extra one costs a fetch per regional
+# source, so they are opt-in
+COUNTRIES = [c.strip().upper() for c in os.environ.get(
+    "REGION_COUNTRIES", "US,CA,GB,DE,FR,ES,IT,PL,NL,SE,BR,MX,JP,KR,IN,AU"
+).split(",") if c.strip()]
+LOCALES = [l.strip() for l in os.environ.get(
+    "REGION_LOCALES", "en-US,en-GB,de,fr,es-ES,it,pl,nl,sv,pt-BR,es-MX,ja,ko"
+).split(",") if l.strip()]
+
+# Seconds before a regional fetch that failed (or found nothing) is tried
+# again; until then the region's last saved result is served
+RETRY_INTERVAL = int(os.environ.get("REGION_RETRY_INTERVAL", 60))
+
+_LOCALE = re.compile(r"^[a-z]{2}(-[A-Z]{2})?$")
+
+
+def region_from_args(args):
+    """``(country, locale)`` from the query string, or None for the default
+    region."""
+    country = args.get("country", "").upper() or DEFAULT_COUNTRY
+    locale = args.get("locale", "") or DEFAULT_LOCALE
+    if country not in COUNTRIES:
+        raise QueryError(f"Unsupported 'country', expected one of {', '.join(COUNTRIES)}")
+    if not _LOCALE.match(locale) or locale not in LOCALES:
+        raise QueryError(f"Unsupported 'locale', expected one of {', '.join(LOCALES)}")
+    if (country, locale) == (DEFAULT_COUNTRY, DEFAULT_LOCALE):
+        return None
+    return country, locale
+
+
+def overlay(payload, sources, results):
+    """Copy of ``payload`` with the stores of ``sources`` replaced by their
+    regional ``results``. Stores without a regional result keep the
+    default region's games."""
+    copied = {
+        section: {key: dict(value) if isinstance(value, dict) else value for key, value in stores.items()}
+        for section, stores in payload.items()
+    }
+    for source in sources:
+        result = results.get(source.name)
+        if not result:
+            continue
+        target = copied[source.section]
+        if source.group is not None:
+            target = target.setdefault(source.group, {})
+        for store in source.stores:
+            games = source.games(result, store)
+            if games:
+                target[store] = games
+    return prune_now(dedupe_payload(copied))
+
+
+class RegionalSnapshots:
+    """Per-region views of the main snapshot.
+
+    Only sources that declare ``region_params`` are fetched per region,
+    everything else (and the thumbnail cache, which is keyed by URL) is
+    shared. Results are cached per source and effective query parameters,
+    so regions that send a source the same parameters (e.g. Steam only
+    cares about the country) share one fetch.
+
+    Like the main snapshot, ``get`` never waits on the network: regional
+    results are fetched in the background, and until one is in the
+    region's last saved result (or the default region's games) is served.
+
+    With a shared snapshot every worker asks for regions, but each fetch
+    key is fetched by one of them at a time; the others wait for it and
+    read its result from the snapshot store.
+    """
+
+    def __init__(self, base, max_built=32):
+        self.base = base  # current_snapshot of the default region
+        # TTLs are added per fetch key as regions are asked for
+        self.results = SnapshotCache(self._load, ttls={}, retry=RETRY_INTERVAL)
+        self.fetches = {}  # fetch key -> (source, params)
+        self.built = OrderedDict()  # region -> (versions, (payload, meta))
+        self.max_built = max_built
+        self.lock = threading.Lock()
+
+    def fetch_key(self, source, region):
+        params = source.region_params(*region)
+        return f"{source.name}@{urlencode(sorted(params.items()))}", params
+
+    def get(self, region, sections=None):
+        payload, meta = self.base(sections)
+        base_status = meta.get("sources", {})
+        sources = [
+            s for s in enabled_sources()
+            if s.region_params and s.section in payload
+            # Fallbacks only where the default region needed them too
+            and (not s.fallback or base_status.get(s.name, {}).get("status") == "ok")
+        ]
+        keys = {}
+        with self.lock:
+            for source in sources:
+                key, params = self.fetch_key(source, region)
+                keys[source.name] = key
+                self.fetches[key] = (source, params)
+                self.results.ttls.setdefault(key, source.interval)
+        fetched, fetched_meta = (
+            self.results.get(list(keys.values()), wait=False) if keys else ({}, {"version": 0, "sources": {}})
+        )
+
+        versions = (meta["version"], fetched_meta["version"], tuple(sorted(payload)))
+        with self.lock:
+            built = self.built.get(region)
+            if built is not None and built[0] == versions:
+                self.built.move_to_end(region)
+                return built[1]
+
+        store = get_store()
+        results = {}
+        for name, key in keys.items():
+            # Fall back to this region's last good result, then to the
+            # default region's games
+            result = fetched.get(key) or store.last_good(key)
+            source = get_source(name)
+            if result and source.localize:
+                result = source.localize(result, *region)
+            results[name] = result
+        # A new regional result changes the document as much as a new base
+        # snapshot does (Last-Modified, see responses.py)
+        published = max(filter(None, [modified_at(meta), modified_at(fetched_meta)]), default=None)
+        snapshot = (overlay(payload, sources, results), dict(
+            meta,
+            version=f"{meta['version']}.{fetched_meta['version']}",
+            published_at=datetime.utcfromtimestamp(published).isoformat() if published else None,
+            region={"country": region[0], "locale": region[1]},
+            sources=dict(meta.get("sources", {}), **fetched_meta.get("sources", {}))
+        ))
+        with self.lock:
+            self.built[region] = (versions, snapshot)
+            while len(self.built) > self.max_built:
+                self.built.popitem(last=False)
+        return snapshot
+
+    def _load(self, keys):
+        fanout = FanOut(DEADLINE)
+        for key in keys:
+            source, params = self.fetches[key]
+            fanout.submit(key, partial(self._fetch, key, source, params))
+        results, sources_meta = fanout.gather()
+        return results, {"sources": sources_meta}
+
+    def _fetch(self, key, source, params, timeout=None):
+        """Fetch ``key`` unless another worker saved a fresh result for it
+        while we waited for its lock. Saved from here rather than after the
+        fan-out, so fetches that outlive the deadline still land in the
+        store (and in ``last_good``)."""
+        store = get_store()
+        with shared.locked(f"{store.path}.{key}.lock") if shared.ENABLED else nullcontext():
+            entry = store.refresh(key) if shared.ENABLED else None
+            if entry is not None and time.time() - entry[0] < source.interval:
+                return entry[1]
+            result = source.load(timeout=timeout, params=params)
+            store.save_results({key: result})
+        return result
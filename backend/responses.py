@@ -0,0 +1,124 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import Response
+from werkzeug.http import http_date, quote_etag
+
+from catalog import json_default
+from metrics import stage
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def dumps(data):
+    """Serialize to compact JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        # orjson encodes the slotted CatalogGame dataclass natively
+        return orjson.dumps(data, default=json_default)
+    return json.dumps(data, default=json_default, separators=(",", ":")).encode("utf-8")
+
+
+def modified_at(meta):
+    """When the data behind ``meta`` last changed, in epoch seconds: the
+    later of its ``published_at`` and the newest load of one of its cached
+    sections, or None when it has neither."""
+    stamps = [meta.get("published_at")]
+    stamps.extend(section["loaded_at"] for section in meta.get("cache", {}).get("sections", {}).values())
+    return max(
+        (datetime.fromisoformat(stamp).replace(tzinfo=timezone.utc).timestamp() for stamp in stamps if stamp),
+        default=None
+    )
+
+
+class EncodedBody:
+    """One published document, serialized and compressed once.
+
+    The ETag is a hash of the body, so it only changes with the content;
+    each content-coding gets its own (``<hash>-gzip``, ``<hash>-br``) since
+    strong validators must differ between representations, and any of them
+    matches If-None-Match. Last-Modified comes from the snapshot's ``meta``, not the time it was
+    encoded, so every worker sends the same one for the same snapshot.
+    """
+
+    def __init__(self, data):
+        with stage("serialize"):
+            self.identity = dumps(data)
+        self.etag = hashlib.sha256(self.identity).hexdigest()[:32]
+        # http_date drops the fraction, If-Modified-Since is compared without it
+        self.last_modified = int(modified_at(data.get("meta", {})) or time.time())
+        with stage("compress"):
+            self.encodings = {"gzip": gzip.compress(self.identity, compresslevel=6)}
+            if brotli is not None:
+                self.encodings["br"] = brotli.compress(self.identity, quality=9)
+        self.etags = dict({name: f"{self.etag}-{name}" for name in self.encodings}, identity=self.etag)
+
+    def negotiate(self, if_none_match, accept_encodings, if_modified_since=None):
+        """``(status, body, headers)`` for a request with these (parsed)
+        headers: a 304 when the client already has this version, otherwise
+        the smallest body it accepts. ``If-Modified-Since`` only counts when
+        there is no ``If-None-Match``."""
+        coding = next(
+            (name for name in ("br", "gzip") if name in self.encodings and accept_encodings[name] > 0),
+            "identity"
+        )
+        headers = {
+            "ETag": quote_etag(self.etags[coding]),
+            "Last-Modified": http_date(self.last_modified),
+            "Vary": "Accept-Encoding",
+            # Let browsers keep the body but revalidate it on every use
+            "Cache-Control": "no-cache"
+        }
+        if any(if_none_match.contains(etag) for etag in self.etags.values()):
+            return 304, b"", headers
+        if not if_none_match and if_modified_since is not None \
+                and self.last_modified <= if_modified_since.timestamp():
+            return 304, b"", headers
+        if coding == "identity":
+            return 200, self.identity, headers
+        headers["Content-Encoding"] = coding
+        return 200, self.encodings[coding], headers
+
+    def response(self, request):
+        """The Flask response for ``request``."""
+        status, body, headers = self.negotiate(
+            request.if_none_match, request.accept_encodings, request.if_modified_since
+        )
+        response = Response(body, status=status, mimetype="application/json")
+        response.headers.update(headers)
+        return response
+
+
+class BodyCache:
+    """Keeps the encoded bodies of the most recently served snapshot
+    versions (one per region)."""
+
+    def __init__(self, size=16):
+        self.size = size
+        self.bodies = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, build):
+        with self.lock:
+            body = self.bodies.get(key)
+            if body is not None:
+                self.bodies.move_to_end(key)
+                return body
+        body = EncodedBody(build())
+        with self.lock:
+            self.bodies[key] = body
+            while len(self.bodies) > self.size:
+                self.bodies.popitem(last=False)
+        return body
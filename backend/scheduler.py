@@ -0,0 +1,186 @@
+import random
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+import expiry
+from fanout import FanOut
+from metrics import TRACE_ALL, trace
+
+# First retry after a failed refresh, doubled on every further failure and
+# capped at the source's normal interval
+BACKOFF_BASE = 60
+
+
+class RefreshScheduler:
+    """Refresh every source on its own interval in a background thread.
+
+    ``sources`` maps a source name to its fetcher and ``intervals`` to its
+    refresh interval in seconds. After each round the per-source results are
+    combined with ``assemble(results)`` and published as a new snapshot;
+    readers only ever see a complete ``(payload, meta)`` pair because it is
+    swapped in with a single assignment. ``needed(name, results, status)``
+    can veto a refresh (e.g. fallback scrapers while the primary source is
+    fine); vetoed sources are asked again a minute later, and their last
+    result is dropped once it is older than their interval, so it doesn't
+    linger in the snapshot.
+
+    ``restored`` (``{name: (fetched_at, value)}``, e.g. from the snapshot
+    store) is published right away and only refreshed once it is due;
+    ``record(results)`` is called with every round's successful results and
+    ``on_publish(payload, meta)`` with every new snapshot. Snapshots are
+    numbered after ``version``, e.g. the last one another process published.
+
+    Offers with a real end date leave the snapshot when they end (a new
+    version is published without them, nothing is fetched), and their
+    source is polled again right after, when the next offer should be up.
+    """
+
+    def __init__(self, sources, intervals, assemble, needed=None, deadline=20, jitter=0.1,
+                 restored=None, record=None, on_publish=None, version=0):
+        self.sources = sources
+        self.intervals = intervals
+        self.assemble = assemble
+        self.needed = needed or (lambda name, results, status: True)
+        self.deadline = deadline
+        self.jitter = jitter
+        self.results = {}
+        self.fetched_at = {}
+        self.status = {name: {"status": "pending"} for name in sources}
+        self.next_run = {name: 0 for name in sources}
+        self.failures = {name: 0 for name in sources}
+        self.record = record
+        self.on_publish = on_publish
+        for name, (fetched_at, value) in (restored or {}).items():
+            if name in sources:
+                self.results[name] = value
+                self.fetched_at[name] = fetched_at
+                self.status[name] = {
+                    "status": "restored",
+                    "updated_at": datetime.utcfromtimestamp(fetched_at).isoformat()
+                }
+                self.next_run[name] = fetched_at + self.intervals[name]
+                end = expiry.next_end(value, fetched_at)
+                if end is not None:
+                    self.next_run[name] = min(self.next_run[name], end + expiry.REPOLL_DELAY)
+        self.heap = []  # end dates of the offers in the current snapshot
+        self.version = version
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.snapshot = None
+        self._publish()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="refresh-scheduler", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def get(self, sections=None):
+        """Return the current ``(payload, meta)``, never touching the network.
+
+        The snapshot always holds every section, ``sections`` is accepted for
+        parity with ``SnapshotCache.get``.
+        """
+        return self.snapshot
+
+    def refresh_due(self):
+        """Refresh every source whose interval has passed, then publish."""
+        due = self.due()
+        if not due:
+            return False
+        fanout = FanOut(self.deadline)
+        for name in due:
+            fanout.submit(name, self.sources[name])
+        self.apply(due, *fanout.gather())
+        return True
+
+    def due(self):
+        """Sources to refresh now; vetoed ones are postponed."""
+        now = time.time()
+        due = [name for name, at in self.next_run.items() if at <= now]
+        skipped = [name for name in due if not self.needed(name, self.results, self.status)]
+        for name in skipped:
+            self.next_run[name] = now + BACKOFF_BASE
+            if name in self.results and now - self.fetched_at.get(name, 0) > self.intervals[name]:
+                del self.results[name]
+            if self.status[name]["status"] == "pending":
+                self.status[name] = {"status": "skipped"}
+        return [name for name in due if name not in skipped]
+
+    def apply(self, due, results, meta):
+        """Take in the results of one round over ``due`` and publish."""
+        if self.record:
+            self.record({name: value for name, value in results.items() if meta[name]["status"] == "ok"})
+
+        now = time.time()
+        for name in due:
+            source_meta = meta[name]
+            if source_meta["status"] == "ok":
+                self.results[name] = results[name]
+                self.fetched_at[name] = now
+                self.failures[name] = 0
+                delay = self._interval(name)
+                end = expiry.next_end(results[name], now)
+                if end is not None:
+                    delay = min(delay, end - now + expiry.REPOLL_DELAY)
+                source_meta["updated_at"] = datetime.utcnow().isoformat()
+            else:
+                # Keep serving the last good result and retry sooner
+                self.failures[name] += 1
+                backoff = BACKOFF_BASE * 2 ** (self.failures[name] - 1)
+                delay = min(backoff, self._interval(name))
+                source_meta["updated_at"] = self.status[name].get("updated_at")
+            self.next_run[name] = now + delay
+            self.status[name] = source_meta
+
+        self._publish()
+
+    def prune_expired(self):
+        """Publish the snapshot again without the offers that have ended."""
+        if (expiry.next_expiry(self.heap) or float("inf")) > time.time():
+            return False
+        payload, meta = self.snapshot
+        self.version += 1
+        meta = dict(meta, version=self.version, published_at=datetime.utcnow().isoformat())
+        self.snapshot = (expiry.prune(payload, self.heap), meta)
+        if self.on_publish:
+            self.on_publish(*self.snapshot)
+        return True
+
+    def idle_time(self):
+        """Seconds to sleep until the next source is due or offer ends (1 to 60)."""
+        wake = min(self.next_run.values(), default=time.time() + 60)
+        wake = min(wake, expiry.next_expiry(self.heap) or wake)
+        return min(max(wake - time.time(), 1), 60)
+
+    def _interval(self, name):
+        interval = self.intervals[name]
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _publish(self):
+        self.version += 1
+        payload = self.assemble(self.results)
+        self.heap = expiry.build_heap(payload)
+        payload = expiry.prune(payload, self.heap)
+        meta = {
+            "version": self.version,
+            "published_at": datetime.utcnow().isoformat(),
+            "sources": {name: dict(status) for name, status in self.status.items()}
+        }
+        self.snapshot = (payload, meta)
+        if self.on_publish:
+            self.on_publish(payload, meta)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.prune_expired()
+                with trace("refresh") if TRACE_ALL else nullcontext():
+                    self.refresh_due()
+            except Exception as e:
+                print("Refresh scheduler error:", e)
+            self.stop_event.wait(self.idle_time())
@@ -1,92 +1,92 @@
-import requests
-from bs4 import BeautifulSoup
+from parsing import make_soup, selector, strainer
+from catalog import bucket_games, genre_index
+from sources import Source, register
+from expiry import to_iso
 import json
 import os
-from datetime import datetime, timedelta
+import re
+from datetime import datetime, timedelta, timezone
 
 BACKUP_JSON_PATH = 'free_games_backup.json'
 
 def get_permanent_free_games():
     try:
-        # PC Games from FreeToGame
-        pc_response = requests.get("https://www.freetogame.com/api/games", timeout=10)
-        pc_data = pc_response.json()
-        
-        return {
-            "pc": categorize_games(pc_data)  # Only return PC games
-        }
+        return load_permanent_free_games()
     except Exception as e:
         print("Error fetching permanent games:", e)
         return { "pc": {} }  # Only return PC games structure
 
+# The load_* functions below raise on any failure so callers that track
+# source health can tell a failed fetch from an empty one; the get_*
+# wrappers keep the old never-raise behaviour. Both go through the source
+# definitions at the end of this file.
+
+def load_permanent_free_games(timeout=10):
+    return FREETOGAME.load(timeout)
+
+def parse_freetogame(response):
+    return {
+        "pc": genre_index(response)  # Only return PC games
+    }
+
 def get_temporary_free_games():
     try:
-        # Try CheapShark API first for Steam, GOG, etc.
-        cheap_shark_games = get_cheap_shark_free_games()
-        
-        # Get Epic Games directly from your scraper
-        epic_games = get_epic_free_games()
-        
-        # Combine results with consistent store naming
-        result = {
-            "pc": {
-                "epic_games": epic_games,
-                "steam": cheap_shark_games.get('steam', []) or get_steam_free_games(),
-                "gog": cheap_shark_games.get('gog', []) or get_gog_free_games(),
-                "humble": cheap_shark_games.get('humble', []) or get_humble_free_games(),
-                "itchio": get_itchio_free_games(),
-                "origin": get_origin_free_games()
-            }
-        }
-        
-        # If any store has no games, try loading from backup
-        if any(not games for games in result['pc'].values()):
-            backup_data = load_backup_data()
-            for store in result['pc']:
-                if not result['pc'][store]:
-                    result['pc'][store] = backup_data['pc'].get(store, [])
-        
-        return result
-        
+        # Same sources, fallbacks and backup filling as /api/free-games
+        # (imported here, pipeline imports this module)
+        from pipeline import collect_free_games
+        payload, _ = collect_free_games(["temporary"])
+        return payload["temporary"]
+
     except Exception as e:
         print(f"Error in get_temporary_free_games: {str(e)}")
         # Fallback to backup data if everything fails
         return load_backup_data()
-    
+
 def get_cheap_shark_free_games():
     try:
-        url = "https://www.cheapshark.com/api/1.0/deals?upperPrice=0&onSale=1"
-        response = requests.get(url, timeout=15)
-        deals = response.json()
-        
-        games_by_store = {"steam": [], "gog": [], "humble": []}
-        
-        for deal in deals:
-            game = {
-                "title": deal["title"],
-                "link": f"https://www.cheapshark.com/redirect?dealID={deal['dealID']}",
-                "thumbnail": deal["thumb"],
-                "store": deal["storeID"].lower(),
-                "end_date": (datetime.utcnow() + timedelta(days=3)).isoformat()
-            }
-            
-            # Map CheapShark store IDs to our store names
-            store_map = {
-                "1": "steam",
-                "7": "gog",
-                "11": "humble"
-            }
-            
-            if deal["storeID"] in store_map:
-                games_by_store[store_map[deal["storeID"]]].append(game)
-        
-        return games_by_store
-        
+        return load_cheap_shark_free_games()
     except Exception as e:
         print(f"CheapShark API error: {str(e)}")
         return {}
-    
+
+def load_cheap_shark_free_games(timeout=15):
+    return CHEAPSHARK.load(timeout)
+
+# CheapShark store IDs of the stores we list
+CHEAPSHARK_STORES = {
+    "1": "steam",
+    "7": "gog",
+    "11": "humble"
+}
+
+def parse_cheap_shark_deals(deals):
+    games_by_store = {store: [] for store in CHEAPSHARK_STORES.values()}
+
+    for deal in deals:
+        store = CHEAPSHARK_STORES.get(deal["storeID"])
+        if store is None:
+            continue
+        games_by_store[store].append({
+            "title": deal["title"],
+            "link": f"https://www.cheapshark.com/redirect?dealID={deal['dealID']}",
+            "thumbnail": deal["thumb"],
+            "store": deal["storeID"].lower(),
+            "end_date": (datetime.utcnow() + timedelta(days=3)).isoformat(),
+            "end_date_estimated": True
+        })
+
+    return games_by_store
+
+_backup_data = None
+
 def load_backup_data():
+    # The backup file never changes while we run, read it once
+    global _backup_data
+    if _backup_data is None:
+        _backup_data = read_backup_file()
+    return _backup_data
+
+def read_backup_file():
     try:
         if os.path.exists(BACKUP_JSON_PATH):
             with open(BACKUP_JSON_PATH, 'r') as f:
@@ -114,336 +114,482 @@ def optimize_thumbnail_url(url):
 
 def get_humble_free_games():
     try:
-        url = "https://www.humblebundle.com/store/api/search?sort=discount&filter=free"
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers, timeout=15)
-        data = response.json()
+        return load_humble_free_games()
+    except Exception as e:
+        print("Humble Bundle error:", e)
+        return []
+
+def load_humble_free_games(timeout=15):
+    return HUMBLE_FREE.load(timeout)
 
-        return [{
+def parse_humble_search(data):
+    games = []
+    for game in data.get("results", []):
+        entry = {
             "title": game["human_name"],
             "link": f"https://www.humblebundle.com/store/{game['human_url']}",
             "thumbnail": game["standard_carousel_image"],
             "store": "humble",
-            "platforms": ["windows"],
-            "end_date": (datetime.utcnow() + timedelta(days=4)).isoformat()  # estimated
-        } for game in data.get("results", [])]
-    except Exception as e:
-        print("Humble Bundle error:", e)
-        return []
-    
+            "platforms": ["windows"]
+        }
+        if game.get("sale_end"):
+            entry["end_date"] = to_iso(game["sale_end"])
+        else:
+            entry["end_date"] = (datetime.utcnow() + timedelta(days=4)).isoformat()
+            entry["end_date_estimated"] = True
+        games.append(entry)
+    return games
 
 def get_itchio_free_games():
     try:
-        url = "https://itch.io/games/free"
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers, timeout=15)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        games = []
-        for game in soup.select('.game_cell'):
-            games.append({
-                "title": game.select('.game_title')[0].text.strip(),
-                "link": game.select('a.title_link')[0]['href'],
-                "thumbnail": game.select('img.game_thumb')[0]['src'],
-                "store": "itchio",
-                "platforms": get_itchio_platforms(game),
-                "end_date": (datetime.utcnow() + timedelta(days=7)).isoformat()  # estimated
-            })
-        return games
+        return load_itchio_free_games()
     except Exception as e:
         print("itch.io error:", e)
         return []
 
+def load_itchio_free_games(timeout=15):
+    return ITCHIO.load(timeout)
+
+ITCHIO_CELLS = strainer("div", class_="game_cell")
+ITCHIO_CELL = selector('.game_cell')
+ITCHIO_TITLE = selector('.game_title')
+ITCHIO_LINK = selector('a.title_link')
+ITCHIO_THUMB = selector('img.game_thumb')
+ITCHIO_PLATFORMS = [
+    (selector('.platform_win'), "windows"),
+    (selector('.platform_mac'), "mac"),
+    (selector('.platform_linux'), "linux")
+]
+
+def parse_itchio_games(html):
+    soup = make_soup(html, ITCHIO_CELLS)
+
+    games = []
+    for game in ITCHIO_CELL.select(soup):
+        games.append({
+            "title": ITCHIO_TITLE.select_one(game).text.strip(),
+            "link": ITCHIO_LINK.select_one(game)['href'],
+            "thumbnail": ITCHIO_THUMB.select_one(game)['src'],
+            "store": "itchio",
+            "platforms": get_itchio_platforms(game),
+            "end_date": (datetime.utcnow() + timedelta(days=7)).isoformat(),
+            "end_date_estimated": True
+        })
+    return games
+
 def get_itchio_platforms(game_element):
-    platforms = []
-    if game_element.select('.platform_win'): platforms.append("windows")
-    if game_element.select('.platform_mac'): platforms.append("mac")
-    if game_element.select('.platform_linux'): platforms.append("linux")
-    return platforms  
+    return [platform for pattern, platform in ITCHIO_PLATFORMS if pattern.select_one(game_element)]
 
 def get_origin_free_games():
     try:
-        url = "https://www.origin.com/usa/en-us/free-games"
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers, timeout=15)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        games = []
-        for game in soup.select('.origin-store-game-tile'):
-            if "On the House" in game.text:
-                games.append({
-                    "title": game.select('.origin-store-game-tile-title')[0].text.strip(),
-                    "link": "https://www.origin.com" + game.find('a')['href'],
-                    "thumbnail": game.select('img.origin-store-game-tile-image')[0]['src'],
-                    "store": "origin",
-                    "platforms": ["windows"],
-                    "end_date": (datetime.utcnow() + timedelta(days=5)).isoformat()  # estimated
-                })
-        return games
+        return load_origin_free_games()
     except Exception as e:
         print("Origin error:", e)
         return []
+
+def load_origin_free_games(timeout=15):
+    return ORIGIN.load(timeout)
+
+ORIGIN_TILES = strainer(class_="origin-store-game-tile")
+ORIGIN_TILE = selector('.origin-store-game-tile')
+ORIGIN_TITLE = selector('.origin-store-game-tile-title')
+ORIGIN_IMAGE = selector('img.origin-store-game-tile-image')
+ORIGIN_END_DATE = selector('.origin-store-program-promo-end-date')
+
+def parse_origin_games(html):
+    soup = make_soup(html, ORIGIN_TILES)
+
+    games = []
+    for game in ORIGIN_TILE.select(soup):
+        if "On the House" in game.text:
+            entry = {
+                "title": ORIGIN_TITLE.select_one(game).text.strip(),
+                "link": "https://www.origin.com" + game.find('a')['href'],
+                "thumbnail": ORIGIN_IMAGE.select_one(game)['src'],
+                "store": "origin",
+                "platforms": ["windows"],
+                "end_date": extract_origin_end_date(game)
+            }
+            if not entry["end_date"]:
+                entry["end_date"] = (datetime.utcnow() + timedelta(days=5)).isoformat()
+                entry["end_date_estimated"] = True
+            games.append(entry)
+    return games
     
 def extract_origin_end_date(game_element):
     try:
         # Origin typically shows dates like "Free until Mar 15"
-        date_text = game_element.select('.origin-store-program-promo-end-date')[0].text
-        date_str = re.search(r'until (.*)', date_text).group(1)
-        return str(datetime.strptime(date_str, '%b %d').replace(year=datetime.now().year))
-    except:
+        date_text = ORIGIN_END_DATE.select_one(game_element).text
+        date_str = re.search(r'until (.*)', date_text).group(1).strip()
+        now = datetime.utcnow()
+        end = datetime.strptime(date_str, '%b %d').replace(year=now.year)
+        # "Jan 5" shown in December is next year's
+        if end < now - timedelta(days=31):
+            end = end.replace(year=now.year + 1)
+        # Free through that whole day
+        return to_iso((end + timedelta(days=1)).replace(tzinfo=timezone.utc).timestamp())
+    except Exception:
         return ""  # Return empty if date parsing fails
 
 def get_epic_free_games():
     try:
-        url = "https://store-site-backend-static.ak.epicgames.com/freeGamesPromotions"
-        params = {"locale": "en-US", "country": "US", "allowCountries": "US"}
-        response = requests.get(url, params=params, timeout=15)
-        data = response.json()
-        
-        free_games = []
-        elements = data.get("data", {}).get("Catalog", {}).get("searchStore", {}).get("elements", [])
-        
-        for game in elements:
-            promotions = game.get("promotions")
-            if not promotions:
-                continue
-                
-            # Check both current and upcoming promotions
-            for offer_type in ["promotionalOffers", "upcomingPromotionalOffers"]:
-                offers = promotions.get(offer_type, [])
-                for offer_group in offers:
-                    for offer in offer_group.get("promotionalOffers", []):
-                        if offer.get("discountSetting", {}).get("discountPercentage", 100) == 0:
-                            slug = (game.get("productSlug") or 
-                                  game.get("urlSlug") or 
-                                  game.get("catalogNs", {}).get("mappings", [{}])[0].get("pageSlug"))
-                            
-                            if not slug or slug == "[]":
-                                continue
-                                
-                            # Get the best available image
-                            thumbnail = ""
-                            for img_type in ["Thumbnail", "OfferImageTall", "OfferImageWide", "DieselStoreFrontWide"]:
-                                thumbnail = next(
-                                    (img["url"] for img in game.get("keyImages", []) 
-                                     if img.get("type") == img_type),
-                                    ""
-                                )
-                                if thumbnail:
-                                    break
-                            
-                            free_games.append({
-                                "title": game["title"],
-                                "link": f"https://store.epicgames.com/en-US/p/{slug}",
-                                "thumbnail": optimize_thumbnail_url(thumbnail),
-                                "description": game.get("description", ""),
-                                "store": "Epic",
-                                "platforms": ["windows"], 
-                                "end_date": offer.get("endDate", "")
-                            })
-                            break
-        
-        return free_games
+        return load_epic_free_games()
     except Exception as e:
         print("Epic Games scraper error:", e)
         return []
 
+def load_epic_free_games(timeout=15):
+    return EPIC.load(timeout)
+
+# Languages Epic's store has pages in; links for any other locale use en-US
+EPIC_STORE_LOCALES = {
+    "ar", "de", "en-US", "es-ES", "es-MX", "fr", "it", "ja", "ko", "pl", "pt-BR", "ru", "th", "tr", "zh-CN", "zh-Hant"
+}
+
+def epic_product_link(slug, locale="en-US"):
+    if locale not in EPIC_STORE_LOCALES:
+        locale = "en-US"
+    return f"https://store.epicgames.com/{locale}/p/{slug}"
+
+def localize_epic_games(games, country, locale):
+    """Point the store links of one (regional) Epic result at ``locale``."""
+    return [
+        dict(game, link=epic_product_link(game["link"].rsplit("/p/", 1)[1], locale))
+        if "/p/" in game.get("link", "") else game
+        for game in games
+    ]
+
+def parse_epic_promotions(data):
+
+    free_games = []
+    elements = data.get("data", {}).get("Catalog", {}).get("searchStore", {}).get("elements", [])
+
+    for game in elements:
+        promotions = game.get("promotions")
+        if not promotions:
+            continue
+
+        # Check both current and upcoming promotions
+        for offer_type in ["promotionalOffers", "upcomingPromotionalOffers"]:
+            offers = promotions.get(offer_type, [])
+            for offer_group in offers:
+                for offer in offer_group.get("promotionalOffers", []):
+                    if offer.get("discountSetting", {}).get("discountPercentage", 100) == 0:
+                        slug = (game.get("productSlug") or 
+                              game.get("urlSlug") or 
+                              game.get("catalogNs", {}).get("mappings", [{}])[0].get("pageSlug"))
+
+                        if not slug or slug == "[]":
+                            continue
+
+                        # Get the best available image
+                        thumbnail = ""
+                        for img_type in ["Thumbnail", "OfferImageTall", "OfferImageWide", "DieselStoreFrontWide"]:
+                            thumbnail = next(
+                                (img["url"] for img in game.get("keyImages", []) 
+                                 if img.get("type") == img_type),
+                                ""
+                            )
+                            if thumbnail:
+                                break
+
+                        free_games.append({
+                            "title": game["title"],
+                            "link": epic_product_link(slug),
+                            "thumbnail": optimize_thumbnail_url(thumbnail),
+                            "description": game.get("description", ""),
+                            "store": "Epic",
+                            "platforms": ["windows"], 
+                            "end_date": offer.get("endDate", "")
+                        })
+                        break
+
+    return free_games
+
+
 def get_steam_free_games():
     try:
-        url = "https://store.steampowered.com/search/?maxprice=free&specials=1"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=15)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        free_games = []
-        game_rows = soup.select('#search_resultsRows a')
-
-        for game in game_rows:
-            title = game.select('.title')[0].text.strip()
-            link = game['href']
-            app_id = link.split('/')[4] if len(link.split('/')) > 4 else ''
-
-            thumbnail = f"https://cdn.cloudflare.steamstatic.com/steam/apps/{app_id}/header.jpg"
-
-            price_block = game.select('.search_price')
-            if len(price_block) > 0:
-                original_price = price_block[0].text.strip()
-                if 'Free' in original_price and '100%' in original_price:
-                    free_games.append({
-                        "title": title,
-                        "link": link,
-                        "thumbnail": thumbnail,
-                        "store": "steam",
-                        "platforms": ["windows"],
-                        "end_date": (datetime.utcnow() + timedelta(days=3)).isoformat()  # estimated
-                    })
-
-        return free_games
+        return load_steam_free_games()
     except Exception as e:
         print("Steam scraper error:", e)
         return []
 
+def load_steam_free_games(timeout=15):
+    return STEAM_FREE.load(timeout)
+
+STEAM_RESULTS = strainer(id="search_resultsRows")
+STEAM_ROW = selector('#search_resultsRows a')
+STEAM_TITLE = selector('.title')
+STEAM_PRICE = selector('.search_price')
+
+def parse_steam_search(html):
+    soup = make_soup(html, STEAM_RESULTS)
+
+    free_games = []
+    for game in STEAM_ROW.select(soup):
+        title = STEAM_TITLE.select_one(game).text.strip()
+        link = game['href']
+        app_id = link.split('/')[4] if len(link.split('/')) > 4 else ''
+
+        thumbnail = f"https://cdn.cloudflare.steamstatic.com/steam/apps/{app_id}/header.jpg"
+
+        price_block = STEAM_PRICE.select_one(game)
+        if price_block is not None:
+            original_price = price_block.text.strip()
+            if 'Free' in original_price and '100%' in original_price:
+                free_games.append({
+                    "title": title,
+                    "link": link,
+                    "thumbnail": thumbnail,
+                    "store": "steam",
+                    "platforms": ["windows"],
+                    "end_date": (datetime.utcnow() + timedelta(days=3)).isoformat(),
+                    "end_date_estimated": True
+                })
+
+    return free_games
+
 def get_gog_free_games():
     try:
-        url = "https://www.gog.com/en/games?priceRange=0,0&discounted=true"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=15)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        free_games = []
-        game_cards = soup.select('.product-tile')
-
-        for game in game_cards:
-            discount_tag = game.select('.product-tile__discount-tag')
-            if not discount_tag or '100%' not in discount_tag[0].text:
-                continue
-
-            title = game.select('.product-tile__title')[0].text.strip()
-            link = "https://www.gog.com" + game['href']
-            thumbnail = game.select('.product-tile__image source')[0]['srcset'].split()[0]
-
-            free_games.append({
-                "title": title,
-                "link": link,
-                "thumbnail": thumbnail,
-                "genre": "gog",
-                "store": "gog",
-                "platforms": ["windows"],
-                "end_date": (datetime.utcnow() + timedelta(days=2)).isoformat()  # estimated
-            })
-
-        return free_games
+        return load_gog_free_games()
     except Exception as e:
         print("GOG scraper error:", e)
         return []
 
+def load_gog_free_games(timeout=15):
+    return GOG_FREE.load(timeout)
+
+GOG_TILES = strainer(class_="product-tile")
+GOG_TILE = selector('.product-tile')
+GOG_DISCOUNT = selector('.product-tile__discount-tag')
+GOG_TITLE = selector('.product-tile__title')
+GOG_IMAGE = selector('.product-tile__image source')
+
+def parse_gog_games(html):
+    soup = make_soup(html, GOG_TILES)
+
+    free_games = []
+    for game in GOG_TILE.select(soup):
+        discount_tag = GOG_DISCOUNT.select_one(game)
+        if discount_tag is None or '100%' not in discount_tag.text:
+            continue
+
+        title = GOG_TITLE.select_one(game).text.strip()
+        link = "https://www.gog.com" + game['href']
+        thumbnail = GOG_IMAGE.select_one(game)['srcset'].split()[0]
+
+        free_games.append({
+            "title": title,
+            "link": link,
+            "thumbnail": thumbnail,
+            "genre": "gog",
+            "store": "gog",
+            "platforms": ["windows"],
+            "end_date": (datetime.utcnow() + timedelta(days=2)).isoformat(),
+            "end_date_estimated": True
+        })
+
+    return free_games
+
 def get_ps_plus_free_games():
     try:
-        url = "https://www.playstation.com/en-us/ps-plus/games/"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=15)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        free_games = []
-        game_cards = soup.select('.cmp-game-card')
-        
-        for game in game_cards:
-            title = game.select('.cmp-game-card__title')[0].text.strip()
-            link = "https://www.playstation.com" + game.select('a')[0]['href']
-            thumbnail = game.select('img')[0]['src']
-            
-            free_games.append({
-                "title": title,
-                "link": link,
-                "thumbnail": thumbnail,
-                "genre": "playstation",
-                "store": "playstation"
-            })
-        
-        return free_games
+        return load_ps_plus_free_games()
     except Exception as e:
         print("PlayStation Plus scraper error:", e)
         return []
 
+def load_ps_plus_free_games(timeout=15):
+    return PS_PLUS.load(timeout)
+
+PS_CARDS = strainer(class_="cmp-game-card")
+PS_CARD = selector('.cmp-game-card')
+PS_TITLE = selector('.cmp-game-card__title')
+
+def parse_ps_plus_games(html):
+    soup = make_soup(html, PS_CARDS)
+    
+    free_games = []
+    for game in PS_CARD.select(soup):
+        title = PS_TITLE.select_one(game).text.strip()
+        link = "https://www.playstation.com" + game.find('a')['href']
+        thumbnail = game.find('img')['src']
+        
+        free_games.append({
+            "title": title,
+            "link": link,
+            "thumbnail": thumbnail,
+            "genre": "playstation",
+            "store": "playstation"
+        })
+    
+    return free_games
+
 def get_xbox_gold_free_games():
     try:
-        url = "https://www.xbox.com/en-US/live/gold#gameswithgold"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=15)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        free_games = []
-        game_cards = soup.select('.gameDiv')
-        
-        for game in game_cards:
-            title = game.select('.gameTitle')[0].text.strip()
-            link = "https://www.xbox.com" + game.select('a')[0]['href']
-            thumbnail = game.select('img')[0]['src']
-            
-            free_games.append({
-                "title": title,
-                "link": link,
-                "thumbnail": thumbnail,
-                "genre": "xbox",
-                "store": "xbox"
-            })
-        
-        return free_games
+        return load_xbox_gold_free_games()
     except Exception as e:
         print("Xbox Gold scraper error:", e)
         return []
 
+def load_xbox_gold_free_games(timeout=15):
+    return XBOX_GOLD.load(timeout)
+
+XBOX_CARDS = strainer(class_="gameDiv")
+XBOX_CARD = selector('.gameDiv')
+XBOX_TITLE = selector('.gameTitle')
+
+def parse_xbox_gold_games(html):
+    soup = make_soup(html, XBOX_CARDS)
+    
+    free_games = []
+    for game in XBOX_CARD.select(soup):
+        title = XBOX_TITLE.select_one(game).text.strip()
+        link = "https://www.xbox.com" + game.find('a')['href']
+        thumbnail = game.find('img')['src']
+        
+        free_games.append({
+            "title": title,
+            "link": link,
+            "thumbnail": thumbnail,
+            "genre": "xbox",
+            "store": "xbox"
+        })
+    
+    return free_games
+
 def get_discounted_games():
-    discounted = {
-        "steam": [],
-        "gog": []
+    return {
+        "steam": get_steam_discounted_games(),
+        "gog": get_gog_discounted_games()
     }
 
-    # --- Steam API ---
+def get_steam_discounted_games():
     try:
-        steam_url = "https://store.steampowered.com/api/featuredcategories?cc=US&l=en"
-        response = requests.get(steam_url, timeout=15)
-        data = response.json()
-
-        for game in data.get("specials", {}).get("items", []):
-            if 0 < game.get("discount_percent", 0) < 100:
-                discounted["steam"].append({
-                    "title": game["name"],
-                    "link": f"https://store.steampowered.com/app/{game['id']}",
-                    "thumbnail": game["header_image"],
-                    "discountPercentage": game["discount_percent"],
-                    "originalPrice": game.get("original_price", 0) / 100 if game.get("original_price") else None,
-                    "finalPrice": (game.get("original_price", 0) * (100 - game.get("discount_percent", 0)) / 10000) if game.get("original_price") else None,
-                    "store": "steam"
-                })
+        return load_steam_discounted_games()
     except Exception as e:
         print("Steam API error:", e)
+        return []
 
-    # --- GOG API ---
+def load_steam_discounted_games(timeout=15):
+    return STEAM_SALE.load(timeout)
+
+def parse_steam_specials(data):
+    discounted = []
+
+    for game in data.get("specials", {}).get("items", []):
+        if 0 < game.get("discount_percent", 0) < 100:
+            discounted.append({
+                "title": game["name"],
+                "link": f"https://store.steampowered.com/app/{game['id']}",
+                "thumbnail": game["header_image"],
+                "discountPercentage": game["discount_percent"],
+                "originalPrice": game.get("original_price", 0) / 100 if game.get("original_price") else None,
+                "finalPrice": (game.get("original_price", 0) * (100 - game.get("discount_percent", 0)) / 10000) if game.get("original_price") else None,
+                "store": "steam",
+                "end_date": to_iso(game["discount_expiration"]) if game.get("discount_expiration") else None
+            })
+
+    return discounted
+
+
+def get_gog_discounted_games():
     try:
-        gog_url = "https://www.gog.com/games/ajax/filtered?mediaType=game&sort=popularity&discounted=true"
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(gog_url, headers=headers, timeout=15)
-        data = response.json()
-
-        for game in data.get("products", []):
-            if game.get("price", {}).get("discountPercentage", 0) < 100:
-                discounted["gog"].append({
-                    "title": game["title"],
-                    "link": "https://www.gog.com" + game["url"],
-                    "thumbnail": "https:" + game["image"] + ".jpg",  # Fixed thumbnail URL
-                    "discountPercentage": game["price"]["discountPercentage"],
-                    "originalPrice": float(game["price"]["baseAmount"]) if game["price"]["baseAmount"] else None,
-                    "finalPrice": float(game["price"]["finalAmount"]) if game["price"]["finalAmount"] else None,
-                    "store": "gog"
-                })
+        return load_gog_discounted_games()
     except Exception as e:
         print("GOG API error:", e)
+        return []
 
-    return discounted
+def load_gog_discounted_games(timeout=15):
+    return GOG_SALE.load(timeout)
+
+def parse_gog_products(data):
+    discounted = []
+
+    for game in data.get("products", []):
+        if game.get("price", {}).get("discountPercentage", 0) < 100:
+            discounted.append({
+                "title": game["title"],
+                "link": "https://www.gog.com" + game["url"],
+                "thumbnail": "https:" + game["image"] + ".jpg",  # Fixed thumbnail URL
+                "discountPercentage": game["price"]["discountPercentage"],
+                "originalPrice": float(game["price"]["baseAmount"]) if game["price"]["baseAmount"] else None,
+                "finalPrice": float(game["price"]["finalAmount"]) if game["price"]["finalAmount"] else None,
+                "store": "gog",
+                # The sale window, when the game is discounted at all
+                "end_date": to_iso(game["salesVisibility"]["to"])
+                if game["price"]["discountPercentage"] and game.get("salesVisibility", {}).get("to") else None
+            })
 
+    return discounted
 
 
 def categorize_games(games_list):
-    categories = {}
-    for game in games_list:
-        genre = game.get("genre", "other").lower()
-        if genre not in categories:
-            categories[genre] = []
-        game_data = {
-            "title": game["title"],
-            "link": game["game_url"] if "game_url" in game else game.get("link", "#"),
-            "thumbnail": game["thumbnail"],
-            "genre": genre,
-            "store": game.get("store", "unknown")
-        }
-        categories[genre].append(game_data)
-    return categories
\ No newline at end of file
+    return bucket_games(games_list)
+
+
+# Every store feed, see sources.py. Set SOURCES_ENABLED / SOURCES_DISABLED
+# to switch them on or off.
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+}
+
+FREETOGAME = register(Source(
+    "freetogame", "permanent", ("pc",), "https://www.freetogame.com/api/games",
+    parse_freetogame, kind="stream", keyed=True, group=None, empty=dict, interval=24 * 60 * 60, timeout=10
+))
+# Epic rotates its giveaway weekly, so a daily check is plenty
+EPIC = register(Source(
+    "epic", "temporary", ("epic_games",),
+    "https://store-site-backend-static.ak.epicgames.com/freeGamesPromotions",
+    parse_epic_promotions, params={"locale": "en-US", "country": "US", "allowCountries": "US"},
+    region_params=lambda country, locale: {"locale": locale, "country": country, "allowCountries": country},
+    localize=localize_epic_games, interval=24 * 60 * 60
+))
+CHEAPSHARK = register(Source(
+    "cheapshark", "temporary", tuple(CHEAPSHARK_STORES.values()),
+    "https://www.cheapshark.com/api/1.0/deals?upperPrice=0&onSale=1",
+    parse_cheap_shark_deals, keyed=True
+))
+# Direct scrapers, only run for stores CheapShark came back empty for
+STEAM_FREE = register(Source(
+    "steam_free", "temporary", ("steam",), "https://store.steampowered.com/search/?maxprice=free&specials=1",
+    parse_steam_search, kind="html", headers=BROWSER_HEADERS, interval=6 * 60 * 60, priority=1, fallback=True,
+    region_params=lambda country, locale: {"cc": country}
+))
+GOG_FREE = register(Source(
+    "gog_free", "temporary", ("gog",), "https://www.gog.com/en/games?priceRange=0,0&discounted=true",
+    parse_gog_games, kind="html", headers=BROWSER_HEADERS, interval=6 * 60 * 60, priority=1, fallback=True
+))
+HUMBLE_FREE = register(Source(
+    "humble_free", "temporary", ("humble",), "https://www.humblebundle.com/store/api/search?sort=discount&filter=free",
+    parse_humble_search, headers={"User-Agent": "Mozilla/5.0"}, interval=6 * 60 * 60, priority=1, fallback=True
+))
+ITCHIO = register(Source(
+    "itchio", "temporary", ("itchio",), "https://itch.io/games/free",
+    parse_itchio_games, kind="html", headers={"User-Agent": "Mozilla/5.0"}, interval=6 * 60 * 60
+))
+ORIGIN = register(Source(
+    "origin", "temporary", ("origin",), "https://www.origin.com/usa/en-us/free-games",
+    parse_origin_games, kind="html", headers={"User-Agent": "Mozilla/5.0"}, interval=12 * 60 * 60
+))
+# Console offers are off unless listed in SOURCES_ENABLED
+PS_PLUS = register(Source(
+    "ps_plus", "temporary", ("playstation",), "https://www.playstation.com/en-us/ps-plus/games/",
+    parse_ps_plus_games, kind="html", headers=BROWSER_HEADERS, interval=24 * 60 * 60,
+    group="console", enabled=False
+))
+XBOX_GOLD = register(Source(
+    "xbox_gold", "temporary", ("xbox",), "https://www.xbox.com/en-US/live/gold#gameswithgold",
+    parse_xbox_gold_games, kind="html", headers=BROWSER_HEADERS, interval=24 * 60 * 60,
+    group="console", enabled=False
+))
+STEAM_SALE = register(Source(
+    "steam_sale", "sale", ("steam",), "https://store.steampowered.com/api/featuredcategories",
+    parse_steam_specials, params={"cc": "US", "l": "en"}, group=None,
+    # Prices and specials differ per country, the language doesn't matter
+    region_params=lambda country, locale: {"cc": country}
+))
+GOG_SALE = register(Source(
+    "gog_sale", "sale", ("gog",), "https://www.gog.com/games/ajax/filtered?mediaType=game&sort=popularity&discounted=true",
+    parse_gog_products, headers={"User-Agent": "Mozilla/5.0"}, group=None
+))
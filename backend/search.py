@@ -0,0 +1,202 @@
+import bisect
+import threading
+from collections import OrderedDict
+from itertools import chain
+
+from catalog import CatalogGame
+from dedup import normalize_title
+from expiry import end_time, parse_iso
+from query import QueryError, decode_cursor, encode_cursor, int_arg, select_fields, DEFAULT_LIMIT, MAX_LIMIT
+
+# Lower bounds of the discount buckets; free giveaways count as 100%
+DISCOUNT_BUCKETS = (0, 25, 50, 75, 100)
+
+
+def _bits(mask):
+    """Positions of the set bits of ``mask``, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _discount(section, game):
+    if section == "temporary":
+        return 100
+    return game.get("discountPercentage") or 0
+
+
+class SearchIndex:
+    """Every game of one snapshot, indexed for /api/search.
+
+    Each filter value maps to a bitset (a Python int, bit ``i`` standing for
+    document ``i``), so a query is a handful of ANDs over ints instead of a
+    scan over the catalog. Title words are indexed whole; the last word of a
+    query also matches as a prefix.
+    """
+
+    def __init__(self, payload):
+        self.docs = []
+        self.tokens = {}
+        self.fields = {"section": {}, "store": {}, "genre": {}, "platform": {}}
+        self.discounts = [0] * len(DISCOUNT_BUCKETS)
+
+        for section, store, genre, game in self._walk(payload):
+            doc = len(self.docs)
+            bit = 1 << doc
+            game = dict(game, section=section, store=store)
+            self.docs.append(game)
+            for token in set(normalize_title(game.get("title")).split()):
+                self.tokens[token] = self.tokens.get(token, 0) | bit
+            values = {
+                "section": [section],
+                "store": [store],
+                "genre": [genre] if genre else [],
+                "platform": game.get("platforms") or []
+            }
+            for field, field_values in values.items():
+                index = self.fields[field]
+                for value in field_values:
+                    value = str(value).lower()
+                    index[value] = index.get(value, 0) | bit
+            bucket = bisect.bisect_right(DISCOUNT_BUCKETS, _discount(section, game)) - 1
+            self.discounts[max(bucket, 0)] |= bit
+
+        self.sorted_tokens = sorted(self.tokens)
+        self.all = (1 << len(self.docs)) - 1
+
+        # Documents with a real end date (estimated ones are left out),
+        # soonest first; ends_masks[i] holds the first i of them so "ends
+        # before" is one bisect and one lookup. Dates are compared as epoch
+        # seconds since stores write them in different ISO formats.
+        dated = sorted(
+            (end, doc) for doc, end in enumerate(map(end_time, self.docs)) if end is not None
+        )
+        self.end_dates = [end for end, _ in dated]
+        self.end_order = [doc for _, doc in dated]
+        self.ends_masks = [0]
+        for doc in self.end_order:
+            self.ends_masks.append(self.ends_masks[-1] | (1 << doc))
+
+    @staticmethod
+    def _walk(payload):
+        """``(section, store, genre, game)`` for every game in the payload:
+        giveaways, then sales, then the free-to-play catalog."""
+        for stores in payload.get("temporary", {}).values():
+            for store, games in stores.items():
+                for game in games:
+                    yield "temporary", store, game.get("genre"), game
+        for store, games in payload.get("sale", {}).items():
+            for game in games:
+                yield "sale", store, game.get("genre"), game
+        for genre, games in payload.get("permanent", {}).get("pc", {}).items():
+            for game in games:
+                if isinstance(game, CatalogGame):
+                    game = game.to_dict()
+                yield "permanent", "freetogame", genre, game
+
+    def match_text(self, text):
+        words = normalize_title(text).split()
+        mask = self.all
+        for word in words[:-1]:
+            mask &= self.tokens.get(word, 0)
+        if words:
+            # The word being typed matches every token it starts
+            last = words[-1]
+            start = bisect.bisect_left(self.sorted_tokens, last)
+            prefix = 0
+            for token in self.sorted_tokens[start:]:
+                if not token.startswith(last):
+                    break
+                prefix |= self.tokens[token]
+            mask &= prefix
+        return mask
+
+    def match_field(self, field, values):
+        mask = 0
+        for value in values.split(","):
+            mask |= self.fields[field].get(value.strip().lower(), 0)
+        return mask
+
+    def match_discount(self, minimum):
+        mask = 0
+        for bound, bucket in zip(DISCOUNT_BUCKETS, self.discounts):
+            if bound >= minimum:
+                mask |= bucket
+            elif bound + 25 > minimum:
+                # The bucket holding ``minimum`` needs an exact check
+                mask |= sum(
+                    1 << doc for doc in _bits(bucket)
+                    if _discount(self.docs[doc]["section"], self.docs[doc]) >= minimum
+                )
+        return mask
+
+    def search(self, args):
+        """Answer an /api/search query string."""
+        mask = self.all
+        if args.get("q"):
+            mask &= self.match_text(args["q"])
+        for field in ("section", "store", "genre", "platform"):
+            if args.get(field):
+                mask &= self.match_field(field, args[field])
+        min_discount = int_arg(args, "min_discount", 0, minimum=0)
+        if min_discount:
+            mask &= self.match_discount(min_discount)
+        ends_before = args.get("ends_before")
+        if ends_before:
+            try:
+                ends_before = parse_iso(ends_before)
+            except ValueError:
+                raise QueryError("'ends_before' must be an ISO date, e.g. 2024-06-01")
+            mask &= self.ends_masks[bisect.bisect_left(self.end_dates, ends_before)]
+
+        sort = args.get("sort", "catalog")
+        if sort not in ("catalog", "end_date"):
+            raise QueryError("'sort' must be 'catalog' or 'end_date'")
+        limit = int_arg(args, "limit", DEFAULT_LIMIT, minimum=1, maximum=MAX_LIMIT)
+        offset = decode_cursor(args["cursor"]) if args.get("cursor") else 0
+        total = mask.bit_count()
+
+        if sort == "end_date":
+            # Soonest ending first, undated (or estimated) games after them
+            dated = mask & self.ends_masks[-1]
+            order = chain((doc for doc in self.end_order if dated >> doc & 1), _bits(mask & ~dated))
+        else:
+            order = _bits(mask)
+        page = []
+        for position, doc in enumerate(order):
+            if position >= offset + limit:
+                break
+            if position >= offset:
+                page.append(doc)
+
+        fields = [f for f in args.get("fields", "").split(",") if f]
+        next_offset = offset + limit
+        return {
+            "items": [select_fields(self.docs[doc], fields) for doc in page],
+            "total": total,
+            "limit": limit,
+            "next_cursor": encode_cursor(next_offset) if next_offset < total else None
+        }
+
+
+class IndexCache:
+    """Search indexes of the most recent snapshots, built on first use."""
+
+    def __init__(self, size=4):
+        self.size = size
+        self.indexes = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, payload):
+        with self.lock:
+            index = self.indexes.get(key)
+            if index is not None:
+                self.indexes.move_to_end(key)
+                return index
+        index = SearchIndex(payload)
+        with self.lock:
+            self.indexes[key] = index
+            while len(self.indexes) > self.size:
+                self.indexes.popitem(last=False)
+        return index
@@ -0,0 +1,215 @@
+import fcntl
+import json
+import mmap
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from responses import dumps
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Share one snapshot between the worker processes of a server (e.g.
+# gunicorn): one worker refreshes, every worker reads what it publishes
+ENABLED = os.environ.get("SHARED_SNAPSHOT", "0") == "1"
+PATH = os.environ.get(
+    "SHARED_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshot.json")
+)
+# How often followers look for a new snapshot (and for a dead leader)
+POLL_INTERVAL = float(os.environ.get("SHARED_POLL_INTERVAL", 1))
+
+EMPTY = ({}, {"version": 0, "sources": {}})
+
+
+class LeaderLock:
+    """Exclusive, non-blocking ``flock`` on a file. The kernel releases it
+    when the holding process exits, however it exits."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    @property
+    def held(self):
+        return self.fd is not None
+
+    def acquire(self):
+        if self.fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self.fd = fd
+        return True
+
+    def holder(self):
+        """PID of the process holding the lock, as far as the file says."""
+        try:
+            with open(self.path) as f:
+                return int(f.read() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+
+@contextmanager
+def locked(path):
+    """Hold an exclusive ``flock`` on ``path`` for the block, waiting for
+    other processes that hold it."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def write_json(path, document):
+    """Replace ``path`` in one rename, so readers never see half of it."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(dumps(document))
+    os.replace(tmp_path, path)
+
+
+def write_snapshot(path, payload, meta):
+    write_json(path, {"payload": payload, "meta": meta})
+
+
+def read_snapshot(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if orjson is not None:
+                # orjson parses straight out of the mapped pages
+                with memoryview(mapped) as view:
+                    document = orjson.loads(view)
+            else:
+                document = json.loads(mapped[:])
+    return document["payload"], document["meta"]
+
+
+class SharedSnapshot:
+    """The snapshot of one leader process, shared by every worker.
+
+    All workers race for a file lock; the winner runs
+    ``lead(version, on_publish)``, which must start refreshing in this
+    process, publish snapshots numbered after ``version`` through
+    ``on_publish(payload, meta)`` and return its ``get`` function. Every
+    snapshot it publishes is written to ``path``; the other workers map
+    that file and decode it once per version, so upstream stores see one
+    scraper however many workers run.
+
+    Followers keep trying the lock. When the leader dies the kernel drops
+    its lock and the first follower to notice takes over, carrying on the
+    version numbers. ``on_load(payload, meta)`` is called with every new
+    snapshot in every worker.
+
+    Every ``poll`` seconds the leader also writes what ``report()``
+    returns (e.g. source health, which only the leader sees) next to the
+    snapshot, for followers to read with ``leader_report``.
+    """
+
+    def __init__(self, path, lead, on_load=None, report=None, poll=POLL_INTERVAL):
+        self.path = path
+        self.lead = lead
+        self.on_load = on_load
+        self.report = report
+        self.poll = poll
+        self.lock = LeaderLock(path + ".lock")
+        self.snapshot = EMPTY
+        self.report_path = path + ".report"
+        self.loaded = None  # (inode, mtime, size) of the file behind self.snapshot
+        self.leader_get = None
+        self.thread = None
+
+    @property
+    def version(self):
+        return self.snapshot[1]["version"]
+
+    def start(self):
+        self.check()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="shared-snapshot", daemon=True)
+            self.thread.start()
+
+    def get(self, sections=None):
+        """The current ``(payload, meta)``; ``sections`` as in ``SnapshotCache.get``."""
+        if self.leader_get is not None:
+            return self.leader_get()
+        return self.snapshot
+
+    def check(self):
+        """Pick up a new snapshot, or take over if the leader is gone."""
+        if self.leader_get is not None:
+            return
+        self.reload()
+        if self.lock.acquire():
+            # Another leader may have published since the reload above
+            self.reload()
+            self.leader_get = self.lead(self.version, self._publish)
+
+    def reload(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if identity == self.loaded:
+            return False
+        snapshot = read_snapshot(self.path)
+        self.loaded = identity
+        if snapshot is None or snapshot[1]["version"] <= self.version:
+            return False
+        self.snapshot = snapshot
+        if self.on_load:
+            self.on_load(*snapshot)
+        return True
+
+    def leader_report(self):
+        """The leader's last ``report()``, or None (e.g. in the leader)."""
+        if self.lock.held:
+            return None
+        try:
+            with open(self.report_path, "rb") as f:
+                return json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def stats(self):
+        return {
+            "role": "leader" if self.lock.held else "follower",
+            "pid": os.getpid(),
+            "leader_pid": os.getpid() if self.lock.held else self.lock.holder(),
+            "version": self.get()[1]["version"]
+        }
+
+    def _publish(self, payload, meta):
+        try:
+            write_snapshot(self.path, payload, meta)
+        except OSError as e:
+            print("Shared snapshot write error:", e)
+        self.snapshot = (payload, meta)
+        if self.on_load:
+            self.on_load(payload, meta)
+
+    def _run(self):
+        while self.leader_get is None or self.report:
+            time.sleep(self.poll)
+            try:
+                if self.leader_get is None:
+                    self.check()
+                else:
+                    write_json(self.report_path, self.report())
+            except Exception as e:
+                print("Shared snapshot error:", e)
@@ -0,0 +1,144 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from catalog import json_default
+
+DB_PATH = os.environ.get(
+    "SNAPSHOT_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots.db")
+)
+# How many results to keep per source
+HISTORY = int(os.environ.get("SNAPSHOT_HISTORY", 48))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_source ON results (source, id);
+CREATE TABLE IF NOT EXISTS latest (
+    source TEXT PRIMARY KEY,
+    result_id INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+
+class SnapshotStore:
+    """Every successful per-source result, kept in SQLite.
+
+    Each save is one transaction, so a crash never leaves a half written
+    result behind. The latest result per source is also kept in memory,
+    which makes ``last_good`` a dict lookup.
+    """
+
+    def __init__(self, path=DB_PATH, history=HISTORY):
+        self.path = path
+        self.history = history
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.latest = None  # source -> (fetched_at, value), loaded on first use
+
+    def save(self, source, value, fetched_at=None):
+        fetched_at = fetched_at or time.time()
+        payload = json.dumps(value, default=json_default, separators=(",", ":"))
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self.conn.execute(
+                    "INSERT INTO results (source, fetched_at, payload) VALUES (?, ?, ?)",
+                    (source, fetched_at, payload)
+                )
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO latest (source, result_id, fetched_at) VALUES (?, ?, ?)",
+                    (source, cursor.lastrowid, fetched_at)
+                )
+                self.conn.execute(
+                    "DELETE FROM results WHERE source = ? AND id <= ("
+                    "SELECT id FROM results WHERE source = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (source, source, self.history)
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            if self.latest is not None:
+                self.latest[source] = (fetched_at, value)
+
+    def save_results(self, results):
+        """Persist every non-empty result of a fetch round."""
+        for source, value in results.items():
+            if value:
+                try:
+                    self.save(source, value)
+                except sqlite3.Error as e:
+                    print(f"Snapshot store error for {source}:", e)
+
+    def last_good(self, source):
+        """Latest saved result of ``source``, or None."""
+        entry = self._latest().get(source)
+        return entry[1] if entry else None
+
+    def last_good_all(self):
+        """``{source: (fetched_at, value)}`` for every source ever saved."""
+        return dict(self._latest())
+
+    def reload(self):
+        """Forget the latest results kept in memory, e.g. because another
+        process has saved newer ones since."""
+        with self.lock:
+            self.latest = None
+
+    def refresh(self, source):
+        """``(fetched_at, value)`` of the latest result of ``source`` as the
+        database has it now (another process may have saved it), or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT l.fetched_at, r.payload FROM latest l JOIN results r ON r.id = l.result_id "
+                "WHERE l.source = ?",
+                (source,)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = (row[0], json.loads(row[1]))
+            if self.latest is not None:
+                self.latest[source] = entry
+        return entry
+
+    def history_of(self, source, limit=10):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT fetched_at, payload FROM results WHERE source = ? ORDER BY id DESC LIMIT ?",
+                (source, limit)
+            ).fetchall()
+        return [(fetched_at, json.loads(payload)) for fetched_at, payload in rows]
+
+    def _latest(self):
+        with self.lock:
+            if self.latest is None:
+                rows = self.conn.execute(
+                    "SELECT l.source, l.fetched_at, r.payload FROM latest l JOIN results r ON r.id = l.result_id"
+                ).fetchall()
+                self.latest = {source: (fetched_at, json.loads(payload)) for source, fetched_at, payload in rows}
+            return self.latest
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The process wide store, opened on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SnapshotStore()
+    return _store
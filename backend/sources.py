@@ -0,0 +1,143 @@
+import asyncio
+import os
+from dataclasses import dataclass
+
+import fetch
+from metrics import BYTES, ERRORS, ITEMS, NOT_MODIFIED, count_items, stage
+from parsing import parse_response
+
+# Comma separated source names to switch on or off without code edits,
+# e.g. SOURCES_ENABLED=ps_plus,xbox_gold
+ENABLED = {name.strip() for name in os.environ.get("SOURCES_ENABLED", "").split(",") if name.strip()}
+DISABLED = {name.strip() for name in os.environ.get("SOURCES_DISABLED", "").split(",") if name.strip()}
+
+
+@dataclass
+class Source:
+    """One upstream feed: where to fetch it, how to parse it and where its
+    games go in the payload.
+
+    ``kind`` is "html" (``parser`` gets the page text), "json" (the decoded
+    body) or "stream" (the streamed response itself). ``stores`` are the
+    keys it fills under ``section`` and ``group`` (None for sections without
+    a platform level); a ``keyed`` source returns ``{store: games}``, any
+    other one a plain list (or whatever ``empty`` makes when it has no
+    games). When several sources fill one store their games are merged,
+    lowest ``priority`` first, and ``fallback`` sources only run when every
+    other source of their store came back empty.
+
+    Sources whose results depend on the user's region declare
+    ``region_params(country, locale)``, the query parameters that select
+    it; everything else is shared by all regions. ``localize(result,
+    country, locale)`` adapts a regional result further, for what the
+    upstream doesn't (e.g. store page links).
+    """
+    name: str
+    section: str
+    stores: tuple
+    url: str
+    parser: object
+    kind: str = "json"
+    params: dict = None
+    headers: dict = None
+    interval: int = 60 * 60
+    timeout: float = 15
+    priority: int = 0
+    enabled: bool = True
+    fallback: bool = False
+    keyed: bool = False
+    group: str = "pc"
+    empty: object = list
+    region_params: object = None
+    localize: object = None
+
+    def __post_init__(self):
+        if self.name in ENABLED:
+            self.enabled = True
+        if self.name in DISABLED:
+            self.enabled = False
+
+    def load(self, timeout=None, params=None):
+        """Fetch and parse; raises on any failure. ``timeout`` can only
+        lower the source's own, ``params`` override the declared ones."""
+        timeout = min(timeout or self.timeout, self.timeout)
+        params = dict(self.params or {}, **(params or {}))
+        try:
+            with stage("fetch", self.name):
+                response = fetch.get(self.url, params=params or None, headers=self.headers,
+                                     timeout=timeout, stream=self.kind == "stream")
+                response.raise_for_status()
+            with stage("parse", self.name):
+                result = self.parse(response)
+        except Exception as e:
+            ERRORS.inc(source=self.name, type=type(e).__name__)
+            raise
+        return self._count(response, result)
+
+    async def aload(self, client, timeout=None, params=None):
+        """``load`` over an ``httpx.AsyncClient``. Parsing runs in a worker
+        thread so big pages don't stall the event loop."""
+        timeout = min(timeout or self.timeout, self.timeout)
+        params = dict(self.params or {}, **(params or {}))
+        try:
+            with stage("fetch", self.name):
+                response = await fetch.aget(client, self.url, params=params or None, headers=self.headers,
+                                            timeout=timeout)
+                response.raise_for_status()
+            with stage("parse", self.name):
+                result = await asyncio.to_thread(self.parse, response)
+        except Exception as e:
+            ERRORS.inc(source=self.name, type=type(e).__name__)
+            raise
+        return self._count(response, result)
+
+    def _count(self, response, result):
+        BYTES.inc(response.bytes_read, source=self.name)
+        if response.not_modified:
+            NOT_MODIFIED.inc(source=self.name)
+        ITEMS.set(count_items(result), source=self.name)
+        return result
+
+    def parse(self, response):
+        if self.kind == "html":
+            return parse_response(response, self.parser)
+        if self.kind == "stream":
+            return self.parser(response)
+        return self.parser(response.json())
+
+    def games(self, result, store):
+        """This source's games for ``store`` out of one of its results."""
+        if self.keyed:
+            return (result or {}).get(store) or self.empty()
+        return result or self.empty()
+
+
+_registry = {}
+
+
+def register(source):
+    _registry[source.name] = source
+    return source
+
+
+def get_source(name):
+    return _registry[name]
+
+
+def all_sources():
+    """Every registered source, in registration order."""
+    return list(_registry.values())
+
+
+def enabled_sources(section=None):
+    """Enabled sources (of ``section``), highest priority first."""
+    sources = [s for s in _registry.values() if s.enabled and section in (None, s.section)]
+    return sorted(sources, key=lambda s: s.priority)
+
+
+def rivals(source):
+    """Enabled non-fallback sources filling any store ``source`` fills."""
+    return [
+        other for other in enabled_sources(source.section)
+        if not other.fallback and other.group == source.group and set(other.stores) & set(source.stores)
+    ]
@@ -0,0 +1,207 @@
+"""Local stand-in for the upstream stores, serving the recorded fixtures.
+
+Point the scrapers at it with ``UPSTREAM_OVERRIDE`` (see fetch.py). Every
+fixture can be scaled up so the pipeline can be measured against catalogs
+larger than the recorded ones.
+"""
+import copy
+import gzip
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# (host, path) -> (fixture file, path to the list that gets scaled up)
+ROUTES = {
+    ("www.freetogame.com", "/api/games"): ("freetogame_games.json", ()),
+    ("www.cheapshark.com", "/api/1.0/deals"): ("cheapshark_deals.json", ()),
+    ("store-site-backend-static.ak.epicgames.com", "/freeGamesPromotions"): (
+        "epic_promotions.json", ("data", "Catalog", "searchStore", "elements")),
+    ("store.steampowered.com", "/api/featuredcategories"): (
+        "steam_featuredcategories.json", ("specials", "items")),
+    ("www.gog.com", "/games/ajax/filtered"): ("gog_filtered.json", ("products",)),
+    ("www.humblebundle.com", "/store/api/search"): ("humble_search.json", ("results",)),
+    ("itch.io", "/games/free"): ("itchio_free.html", None),
+    ("store.steampowered.com", "/search/"): ("steam_search.html", None),
+    ("www.gog.com", "/en/games"): ("gog_games.html", None),
+    ("www.origin.com", "/usa/en-us/free-games"): ("origin_free_games.html", None)
+}
+
+TITLE_KEYS = ("title", "name", "human_name")
+
+# When the fixtures were recorded. Their offer dates are moved forward by
+# the time since, so sales and giveaways end as far in the future as they
+# did then and the expiry pruning leaves the same games whatever the date.
+RECORDED_AT = 1791900000  # 2026-10-13T14:40:00Z
+EPOCH_KEYS = ("discount_expiration", "sale_end", "from", "to")
+DATE_KEYS = ("startDate", "endDate", "effectiveDate", "date")
+
+
+def scale_json(data, list_path, factor):
+    """Repeat the list at ``list_path`` ``factor`` times, renaming the copies."""
+    data = copy.deepcopy(data)
+    parent = data
+    for key in list_path[:-1]:
+        parent = parent[key]
+    items = parent[list_path[-1]] if list_path else data
+
+    scaled = list(items)
+    for n in range(1, factor):
+        for item in items:
+            item = dict(item)
+            for key in TITLE_KEYS:
+                if isinstance(item.get(key), str):
+                    item[key] = f"{item[key]} {n + 1}"
+            scaled.append(item)
+
+    if not list_path:
+        return scaled
+    parent[list_path[-1]] = scaled
+    return data
+
+
+def shift_dates(data, offset):
+    """Copy of ``data`` with every offer date moved by ``offset`` seconds,
+    in the format it was written in."""
+    if isinstance(data, list):
+        return [shift_dates(item, offset) for item in data]
+    if not isinstance(data, dict):
+        return data
+    shifted = {}
+    for key, value in data.items():
+        if key in EPOCH_KEYS and isinstance(value, int) and not isinstance(value, bool):
+            value += offset
+        elif key in DATE_KEYS and isinstance(value, str):
+            try:
+                moved = datetime.fromisoformat(value.replace("Z", "+00:00")) + timedelta(seconds=offset)
+            except ValueError:
+                pass
+            else:
+                if value.endswith("Z"):
+                    value = moved.strftime("%Y-%m-%dT%H:%M:%S.") + f"{moved.microsecond // 1000:03d}Z"
+                else:
+                    value = moved.strftime("%Y-%m-%d %H:%M:%S.%f")
+        else:
+            value = shift_dates(value, offset)
+        shifted[key] = value
+    return shifted
+
+
+def scale_html(html, factor):
+    """Repeat the page's <main> content ``factor`` times."""
+    start = html.index("<main>") + len("<main>")
+    end = html.index("</main>")
+    return html[:start] + html[start:end] * factor + html[end:]
+
+
+def load_bodies(scale=1, now=None):
+    """Response bodies of every route, with the fixtures' dates moved to
+    ``now`` (default: the current time)."""
+    offset = round((time.time() if now is None else now) - RECORDED_AT)
+    bodies = {}
+    for route, (filename, list_path) in ROUTES.items():
+        with open(os.path.join(FIXTURES_DIR, filename), encoding="utf-8") as f:
+            text = f.read()
+        if list_path is None:
+            content_type = "text/html; charset=utf-8"
+            body = scale_html(text, scale).encode("utf-8")
+        else:
+            content_type = "application/json"
+            data = shift_dates(json.loads(text), offset)
+            body = json.dumps(scale_json(data, list_path, scale)).encode("utf-8")
+        bodies[route] = {
+            "body": body,
+            "gzip": gzip.compress(body),
+            "content_type": content_type,
+            "etag": '"%s"' % hashlib.sha1(body).hexdigest()
+        }
+    return bodies
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, scale=1, revalidate=False, delay=0, now=None):
+        super().__init__(("127.0.0.1", port), StandInHandler)
+        self.revalidate = revalidate
+        self.delay = delay  # seconds every response is held back, like a slow store
+        self.now = now      # what the fixtures' dates are moved to, see load_bodies
+        self.load(scale)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def load(self, scale):
+        self.scale = scale
+        self.bodies = load_bodies(scale, self.now)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="standin", daemon=True).start()
+        return self
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Buffer the headers and disable Nagle, otherwise every keep-alive
+    # response stalls ~40ms on a delayed ACK and drowns out what we measure
+    wbufsize = -1
+
+    def setup(self):
+        super().setup()
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        host, _, rest = path.lstrip("/").partition("/")
+        entry = self.server.bodies.get((host, "/" + rest))
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        if entry is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.server.revalidate and self.headers.get("If-None-Match") == entry["etag"]:
+            self.send_response(304)
+            self.send_header("ETag", entry["etag"])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = entry["body"]
+        self.send_response(200)
+        self.send_header("Content-Type", entry["content_type"])
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = entry["gzip"]
+            self.send_header("Content-Encoding", "gzip")
+        if self.server.revalidate:
+            self.send_header("ETag", entry["etag"])
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Serve the recorded store fixtures")
+    arg_parser.add_argument("--port", type=int, default=8900)
+    arg_parser.add_argument("--scale", type=int, default=1)
+    arg_parser.add_argument("--revalidate", action="store_true", help="send ETags and answer 304")
+    args = arg_parser.parse_args()
+
+    server = StandInServer(args.port, args.scale, args.revalidate)
+    print(f"Serving fixtures on {server.base_url} (UPSTREAM_OVERRIDE={server.base_url})")
+    server.serve_forever()
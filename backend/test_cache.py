@@ -0,0 +1,42 @@
+from cache import SnapshotCache
+
+
+class Loader:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self, sections):
+        self.calls += 1
+        value = self.results.pop(0)
+        return {section: value for section in sections}, {"sources": {}}
+
+
+def test_empty_ttls_are_kept():
+    assert SnapshotCache(Loader(), ttls={}).ttls == {}
+
+
+def test_failed_first_load_is_kept_without_retry():
+    loader = Loader(None)
+    cache = SnapshotCache(loader, ttls={"a": 3600})
+    for _ in range(3):
+        cache.get(["a"])
+    assert loader.calls == 1
+
+
+def test_failed_first_load_is_retried_after_retry_interval(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("cache.time.time", lambda: now[0])
+    loader = Loader(None, ["game"])
+    cache = SnapshotCache(loader, ttls={"a": 86400}, retry=60)
+
+    payload, _ = cache.get(["a"])
+    assert "a" not in payload
+    now[0] += 30
+    cache.get(["a"])
+    assert loader.calls == 1
+
+    now[0] += 31
+    payload, _ = cache.get(["a"])
+    assert loader.calls == 2
+    assert payload["a"] == ["game"]
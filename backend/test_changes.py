@@ -0,0 +1,49 @@
+import time
+
+import changes
+from changes import ChangeLog, boot_version
+
+
+def payload(*titles):
+    return {"sale": {"steam": [{"title": title, "link": title} for title in titles]}}
+
+
+def started_log(version, *payloads):
+    log = ChangeLog()
+    for offset, data in enumerate(payloads):
+        log.record(data, {"version": version + offset})
+    return log
+
+
+def test_since_diffs_against_an_earlier_version():
+    log = started_log(10, payload("a"), payload("a", "b"))
+    update = log.since(10)
+    assert not update["reset"]
+    assert [(c["type"], c["key"]) for c in update["changes"]] == [("added", "b")]
+
+
+def test_version_from_before_a_restart_resets(monkeypatch):
+    before = boot_version()
+    old_log = started_log(before, payload("a"), payload("a", "b"), payload("a", "b", "c"))
+    since = old_log.version
+
+    later = time.time() + 60
+    monkeypatch.setattr(changes.time, "time", lambda: later)
+    restarted = started_log(boot_version(), payload("x"), payload("x", "y"))
+    assert restarted.since(since)["reset"]
+
+
+def test_stream_resets_a_version_it_has_not_seen():
+    log = started_log(1, payload("a"))
+    event = next(log.stream(50, heartbeat=0.01))
+    assert event.startswith("id: 1\nevent: changes\n")
+    assert '"reset":true' in event
+
+
+def test_stream_waits_for_new_versions():
+    log = started_log(1, payload("a"))
+    stream = log.stream(1, heartbeat=0.01)
+    assert next(stream) == ": keep-alive\n\n"
+    log.record(payload("a", "b"), {"version": 2})
+    event = next(stream)
+    assert event.startswith("id: 2\n") and '"reset":false' in event
@@ -0,0 +1,57 @@
+import asyncio
+import os
+
+import pytest
+
+import fetch
+from standin import StandInServer
+
+URL = "https://www.freetogame.com/api/games"
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    server = StandInServer(revalidate=True).start()
+    monkeypatch.setattr(fetch, "UPSTREAM_OVERRIDE", server.base_url)
+    monkeypatch.setattr(fetch, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(fetch, "_entries", {})
+    yield tmp_path
+    server.shutdown()
+    server.server_close()
+
+
+def drop_bodies(directory):
+    fetch._entries.clear()
+    for name in os.listdir(directory):
+        if name.endswith(".body"):
+            os.remove(directory / name)
+
+
+def test_revalidated_response_is_served_from_cache(upstream):
+    first = fetch.get(URL)
+    second = fetch.get(URL)
+    assert second.not_modified
+    assert second.content == first.content
+
+
+def test_missing_body_is_fetched_again(upstream):
+    first = fetch.get(URL)
+    drop_bodies(upstream)
+    again = fetch.get(URL)
+    assert again.status_code == 200 and not again.not_modified
+    assert again.content == first.content
+    # ...and cached again for the next round
+    assert fetch.get(URL).not_modified
+
+
+def test_missing_body_is_fetched_again_async(upstream):
+    async def run():
+        async with fetch.async_client() as client:
+            first = await fetch.aget(client, URL)
+            drop_bodies(upstream)
+            again = await fetch.aget(client, URL)
+            return first, again
+
+    first, again = asyncio.run(run())
+    assert again.status_code == 200 and not again.not_modified
+    assert again.content == first.content
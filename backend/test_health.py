@@ -0,0 +1,90 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fanout
+from health import CLOSED, HALF_OPEN, OPEN, HealthRegistry
+
+
+def open_breaker(registry, name="store"):
+    for _ in range(registry.threshold):
+        assert registry.allow(name)
+        registry.record(name, False, 0.1, RuntimeError("down"))
+    assert registry.sources[name].state == OPEN
+
+
+def test_opens_after_threshold_failures():
+    registry = HealthRegistry(threshold=3, cooldown=60)
+    for _ in range(2):
+        registry.record("store", False, 0.1)
+    assert registry.sources["store"].state == CLOSED
+    registry.record("store", False, 0.1)
+    assert registry.sources["store"].state == OPEN
+    assert not registry.allow("store")
+
+
+def test_success_resets_consecutive_failures():
+    registry = HealthRegistry(threshold=3, cooldown=60)
+    registry.record("store", False, 0.1)
+    registry.record("store", False, 0.1)
+    registry.record("store", True, 0.1)
+    registry.record("store", False, 0.1)
+    assert registry.sources["store"].state == CLOSED
+
+
+def test_half_open_allows_a_single_probe():
+    registry = HealthRegistry(threshold=1, cooldown=0)
+    open_breaker(registry)
+    assert registry.allow("store")
+    assert registry.sources["store"].state == HALF_OPEN
+    assert not registry.allow("store")
+
+
+def test_successful_probe_closes():
+    registry = HealthRegistry(threshold=1, cooldown=0)
+    open_breaker(registry)
+    assert registry.allow("store")
+    registry.record("store", True, 0.1)
+    assert registry.sources["store"].state == CLOSED
+    assert registry.allow("store") and registry.allow("store")
+
+
+def test_failed_probe_reopens_with_longer_cooldown():
+    registry = HealthRegistry(threshold=1, cooldown=0.01)
+    open_breaker(registry)
+    time.sleep(0.02)
+    assert registry.allow("store")
+    registry.record("store", False, 0.1)
+    assert registry.sources["store"].state == OPEN
+    assert registry.sources["store"].cooldown == 0.02
+
+
+def test_released_probe_can_be_taken_again():
+    registry = HealthRegistry(threshold=1, cooldown=0)
+    open_breaker(registry)
+    assert registry.allow("store")
+    registry.release("store")
+    assert registry.sources["store"].state == HALF_OPEN
+    assert registry.allow("store")
+
+
+def test_probe_cancelled_at_the_deadline_is_released(monkeypatch):
+    # One worker, kept busy past the deadline, so the probe stays queued
+    monkeypatch.setattr(fanout, "_executor", ThreadPoolExecutor(max_workers=1))
+    registry = HealthRegistry(threshold=1, cooldown=0)
+    open_breaker(registry)
+    busy = threading.Event()
+
+    def blocker(timeout=None):
+        busy.wait(1)
+        return ["game"]
+
+    fan_out = fanout.FanOut(0.05, registry=registry)
+    fan_out.submit("blocker", blocker)
+    fan_out.submit("store", lambda timeout=None: ["game"])
+    _, meta = fan_out.gather()
+    busy.set()
+
+    assert meta["store"]["status"] == "timeout"
+    assert registry.sources["store"].state == HALF_OPEN
+    assert registry.allow("store")
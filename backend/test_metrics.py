@@ -0,0 +1,28 @@
+import metrics
+
+
+def sample(metric, line_start):
+    return next(line for line in metric.render() if line.startswith(line_start)).rsplit(" ", 1)[1]
+
+
+def test_large_counters_render_exactly():
+    counter = metrics.Counter("test_bytes_total", "Bytes", ["source"])
+    counter.inc(123456789, source="a")
+    assert sample(counter, "test_bytes_total{") == "123456789"
+    counter.inc(1, source="a")
+    assert sample(counter, "test_bytes_total{") == "123456790"
+
+
+def test_float_values_keep_every_digit():
+    gauge = metrics.Gauge("test_ratio", "Ratio")
+    gauge.set(1234567.125)
+    assert sample(gauge, "test_ratio ") == "1234567.125"
+
+
+def test_histogram_sum_is_exact_and_bounds_stay_short():
+    histogram = metrics.Histogram("test_seconds", "Seconds", buckets=(0.5, 2.5))
+    for _ in range(3):
+        histogram.observe(1234567.25)
+    lines = histogram.render()
+    assert 'test_seconds_bucket{le="2.5"} 0' in lines
+    assert "test_seconds_sum 3703701.75" in lines
@@ -0,0 +1,32 @@
+from werkzeug.http import parse_accept_header, parse_etags
+
+from responses import EncodedBody
+
+DATA = {"sale": {"steam": [{"title": "Game"}]}, "meta": {"version": 1}}
+
+
+def negotiate(body, if_none_match=None, accept_encoding=None):
+    return body.negotiate(parse_etags(if_none_match), parse_accept_header(accept_encoding))
+
+
+def test_each_coding_has_its_own_etag():
+    body = EncodedBody(DATA)
+    _, _, identity = negotiate(body)
+    _, _, gzipped = negotiate(body, accept_encoding="gzip")
+    assert gzipped["Content-Encoding"] == "gzip"
+    assert identity["ETag"] != gzipped["ETag"]
+    assert gzipped["ETag"] == f'"{body.etag}-gzip"'
+
+
+def test_any_coding_etag_revalidates():
+    body = EncodedBody(DATA)
+    _, _, gzipped = negotiate(body, accept_encoding="gzip")
+    status, content, headers = negotiate(body, if_none_match=gzipped["ETag"])
+    assert (status, content) == (304, b"")
+    assert headers["ETag"] == f'"{body.etag}"'
+
+
+def test_other_etag_gets_the_body():
+    body = EncodedBody(DATA)
+    status, content, _ = negotiate(body, if_none_match='"stale-gzip"')
+    assert status == 200 and content == body.identity
@@ -0,0 +1,261 @@
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import fetch
+from catalog import CatalogGame
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Widths the proxy serves; requests for other widths get the next larger one
+WIDTHS = (120, 240, 460)
+DEFAULT_WIDTH = 240
+FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+QUALITY = 80
+
+CACHE_DIR = os.environ.get(
+    "IMAGE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".image_cache")
+)
+CACHE_BYTES = int(os.environ.get("IMAGE_CACHE_MB", 256)) * 1024 * 1024
+# Originals larger than this are not proxied
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+# How often the cache directory is rescanned for files other worker
+# processes wrote, in seconds
+RESCAN_INTERVAL = 30
+
+# Needs Pillow; without it thumbnails keep pointing at the store CDNs
+ENABLED = Image is not None and os.environ.get("THUMBNAIL_PROXY", "1") != "0"
+
+
+class DiskLRU:
+    """Files in one directory, evicted least recently used first once they
+    take more than ``max_bytes``. Recency survives restarts through mtimes.
+
+    Several processes may share the directory: a miss checks the disk before
+    giving up, and writes rescan the directory when it looks full (and every
+    ``RESCAN_INTERVAL``), so the limit covers every process's files rather
+    than each one's own.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.files = OrderedDict()  # name -> size, oldest first
+        self.total = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """Rebuild ``files`` from the directory (with the lock held, or
+        before anyone else can use it)."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue  # evicted by another process meanwhile
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        self.files = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self.total = sum(self.files.values())
+        self.scanned = time.monotonic()
+
+    def get(self, name):
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self.lock:
+                self.total -= self.files.pop(name, 0)
+            return None
+        with self.lock:
+            # Possibly written by another process
+            self.total += len(data) - self.files.pop(name, 0)
+            self.files[name] = len(data)
+        return data
+
+    def put(self, name, data):
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.total += len(data) - self.files.pop(name, 0)
+            self.files[name] = len(data)
+            if self.total > self.max_bytes or time.monotonic() - self.scanned > RESCAN_INTERVAL:
+                self._scan()
+            while self.total > self.max_bytes and len(self.files) > 1:
+                old, size = self.files.popitem(last=False)
+                self.total -= size
+                try:
+                    os.remove(os.path.join(self.directory, old))
+                except OSError:
+                    pass
+
+
+def image_key(url):
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:24]
+
+
+def pick_width(width):
+    return next((w for w in WIDTHS if w >= width), WIDTHS[-1])
+
+
+def encode_variants(data):
+    """Every ``(width, format) -> bytes`` variant of one original image."""
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    variants = {}
+    for width in WIDTHS:
+        resized = image.copy()
+        if resized.width > width:
+            resized.thumbnail((width, resized.height), Image.LANCZOS)
+        for fmt in FORMATS:
+            frame = resized.convert("RGBA" if has_alpha and fmt == "webp" else "RGB")
+            out = io.BytesIO()
+            frame.save(out, fmt.upper(), quality=QUALITY)
+            variants[width, fmt] = out.getvalue()
+    return variants
+
+
+class ThumbnailProxy:
+    """Serves store thumbnails resized, re-encoded and cached on disk.
+
+    Only URLs that went through ``rewrite`` (i.e. appeared in our own API
+    output) are fetched, so the proxy can't be pointed at arbitrary hosts.
+    Each original is downloaded once and all its variants are encoded in
+    one go.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.cache = None  # opened on first use
+        self.urls = {}     # key -> original URL
+        self.lock = threading.Lock()
+        self.key_locks = {}
+
+    def _cache(self):
+        with self.lock:
+            if self.cache is None:
+                self.cache = DiskLRU(self.cache_dir, self.max_bytes)
+            return self.cache
+
+    def rewrite(self, url, base, width=DEFAULT_WIDTH):
+        if not url or not url.startswith(("http://", "https://")):
+            return url
+        key = image_key(url)
+        if key not in self.urls:
+            self.urls[key] = url
+            self._share(key, url)
+        return f"{base.rstrip('/')}/img/{key}?w={width}"
+
+    def _share(self, key, url):
+        """Write ``key``'s URL next to the cache, for worker processes that
+        get asked for an image only this one has rewritten."""
+        directory = os.path.join(self.cache_dir, "urls")
+        path = os.path.join(directory, key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(tmp_path, "w") as f:
+                f.write(url)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Thumbnail index write error for {key}:", e)
+
+    def original_url(self, key):
+        """URL behind ``key``, from this process or from another one's
+        ``_share``. Raises ``KeyError`` for keys that never went through
+        ``rewrite``."""
+        url = self.urls.get(key)
+        if url is not None:
+            return url
+        try:
+            with open(os.path.join(self.cache_dir, "urls", os.path.basename(key))) as f:
+                url = f.read()
+        except OSError:
+            raise KeyError(key)
+        if image_key(url) != key:
+            raise KeyError(key)
+        self.urls[key] = url
+        return url
+
+    def rewrite_payload(self, value, base):
+        """Copy of ``value`` with every game's ``thumbnail`` pointing at the
+        proxy. Records shared with the snapshot are never modified."""
+        if isinstance(value, CatalogGame):
+            value = value.to_dict()
+        if isinstance(value, dict):
+            if "thumbnail" in value:
+                return dict(value, thumbnail=self.rewrite(value["thumbnail"], base))
+            return {k: self.rewrite_payload(v, base) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.rewrite_payload(v, base) for v in value]
+        return value
+
+    def register(self, value):
+        """Accept every thumbnail in ``value`` at /img without rewriting it,
+        for worker processes that haven't served it themselves."""
+        if isinstance(value, CatalogGame):
+            value = {"thumbnail": value.thumbnail}
+        if isinstance(value, dict):
+            url = value.get("thumbnail")
+            if isinstance(url, str) and url.startswith(("http://", "https://")):
+                self.urls[image_key(url)] = url
+            for v in value.values():
+                if isinstance(v, (dict, list)):
+                    self.register(v)
+        elif isinstance(value, list):
+            for v in value:
+                self.register(v)
+
+    def variant(self, key, width, fmt):
+        """Bytes of one variant, fetching and encoding the original on a miss.
+
+        Raises ``KeyError`` for keys that never went through ``rewrite``.
+        """
+        cache = self._cache()
+        name = f"{key}_{width}.{fmt}"
+        data = cache.get(name)
+        if data is not None:
+            return data
+
+        url = self.original_url(key)
+        with self.lock:
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        # Concurrent misses for one image wait for a single download
+        with key_lock:
+            data = cache.get(name)
+            if data is not None:
+                return data
+            response = fetch.get(url, timeout=10, cache=False)
+            response.raise_for_status()
+            if len(response.content) > MAX_SOURCE_BYTES:
+                raise ValueError(f"Image too large: {url}")
+            for (w, f), encoded in encode_variants(response.content).items():
+                cache.put(f"{key}_{w}.{f}", encoded)
+                if (w, f) == (width, fmt):
+                    data = encoded
+        with self.lock:
+            self.key_locks.pop(key, None)
+        return data
+
+
+proxy = ThumbnailProxy()